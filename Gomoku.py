@@ -2,6 +2,7 @@
 #/usr/local/bin/python3
 # Set the path to your python3 above
 
+import sys
 from gtp_connection import GtpConnection
 from board_util import GoBoardUtil
 from simple_board import SimpleGoBoard
@@ -23,9 +24,44 @@ class Gomoku():
 def run():
     """
     start the gtp connection and wait for commands.
+    With --async, commands are read while a search is running,
+    so that a stop command can interrupt it.
+    With --port or --unix, GTP sessions are served over a socket.
+    The modules of these options are only imported when they are used,
+    so that the plain engine starts quickly.
     """
+    if len(sys.argv) == 1:
+        GtpConnection(Gomoku(), SimpleGoBoard(7)).start_connection()
+        return
+    import argparse
+    parser = argparse.ArgumentParser(description = "Gomoku GTP engine")
+    parser.add_argument("--async", dest = "use_async", action = "store_true",
+                        help = "serve GTP with an interruptible front end")
+    parser.add_argument("--port", type = int,
+                        help = "serve GTP sessions on this TCP port")
+    parser.add_argument("--host", default = "127.0.0.1",
+                        help = "address to listen on with --port")
+    parser.add_argument("--unix", help = "serve GTP sessions on this "
+                        "Unix socket path")
+    parser.add_argument("--workers", type = int,
+                        help = "search processes shared by socket sessions")
+    parser.add_argument("--cache-memory", type = float, metavar = "MB",
+                        help = "memory budget of the search tables of "
+                        "each session, as the cache_memory command; "
+                        "16 MB by default for socket sessions")
+    args = parser.parse_args()
+    if args.port is not None or args.unix is not None:
+        from gtp_server import serve
+        serve(Gomoku(), args.host, args.port, args.unix, args.workers,
+              args.cache_memory)
+        return
     board = SimpleGoBoard(7)
     con = GtpConnection(Gomoku(), board)
+    if args.cache_memory is not None:
+        con.set_cache_memory(args.cache_memory)
+    if args.use_async:
+        from gtp_async import AsyncGtpServer
+        con = AsyncGtpServer(con)
     con.start_connection()
 
 if __name__=='__main__':
@@ -0,0 +1,254 @@
+#!/usr/bin/python3
+"""
+batch_solve.py
+Solve many positions in parallel, for offline analysis.
+
+The input has one position per line, in one of two forms:
+- a GTP move list, such as "b d4 w e5 b c3", played from the empty board
+- a board string as printed by gogui-rules_board, with the rows from
+  top to bottom separated by '/', such as ".X.O.../......./...".
+  An optional trailing "b" or "w" gives the color to play; by default
+  black plays when both colors have the same number of stones.
+Empty lines and lines starting with '#' are skipped.
+Game record files (.sgf, or the binary format of game_record.py) are
+also accepted; the final position of every game is solved, or every
+position with --every-move.
+
+Results are written as JSON lines as soon as they are known, so they
+may come out of input order; "index" is the line number of the position.
+
+Usage:
+    python3 batch_solve.py positions.txt [--size 7] [--timelimit 1]
+                           [--workers N] [--output results.jsonl]
+    python3 batch_solve.py games.sgf [--every-move] ...
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, \
+                               as_completed, wait
+
+from board_util import BLACK, WHITE, EMPTY, PASS, MAXSIZE, coord_to_point
+from game_record import read_records
+from gtp_connection import SEARCH_DEPTH, Minimax, solve_result, \
+                           move_to_coord, int_to_color
+from simple_board import SimpleGoBoard
+
+BOARD_CHARS = {'X': BLACK, 'O': WHITE, '.': EMPTY}
+COLORS = {'b': BLACK, 'w': WHITE}
+# file name extensions read as game records
+RECORD_EXTENSIONS = (".sgf", ".gmk")
+
+
+def is_board_string(text):
+    return all(c in "XO./" for c in text)
+
+
+def board_from_string(text):
+    """
+    Board for a gogui-rules_board style string with '/' between rows.
+    Returns (board, color to play).
+    """
+    parts = text.split()
+    rows = parts[0].split('/')
+    size = len(rows)
+    if not 2 <= size <= MAXSIZE:
+        raise ValueError("board size must be from 2 to {}".format(MAXSIZE))
+    board = SimpleGoBoard(size)
+    counts = {BLACK: 0, WHITE: 0}
+    for i, row in enumerate(rows):
+        if len(row) != size:
+            raise ValueError("board rows must have {} points".format(size))
+        for col, c in enumerate(row):
+            color = BOARD_CHARS[c]
+            if color != EMPTY:
+                board.play_move_gomoku(coord_to_point(size - i, col + 1, size),
+                                       color)
+                counts[color] += 1
+    if len(parts) > 1:
+        color = player_color(parts[1])
+    else:
+        color = BLACK if counts[BLACK] == counts[WHITE] else WHITE
+    board.current_player = color
+    return board, color
+
+
+def board_to_string(board):
+    """
+    Position line for board: rows top to bottom separated by '/',
+    followed by the color to play
+    """
+    chars = {BLACK: 'X', WHITE: 'O', EMPTY: '.'}
+    rows = []
+    for row in range(board.size, 0, -1):
+        start = board.row_start(row)
+        rows.append(''.join(chars[c] for c in
+                            board.board[start : start + board.size]))
+    return '/'.join(rows) + ' ' + int_to_color(board.current_player)
+
+
+def board_from_moves(text, size):
+    """
+    Board after the GTP move list in text.
+    Returns (board, color to play).
+    """
+    if not 2 <= size <= MAXSIZE:
+        raise ValueError("board size must be from 2 to {}".format(MAXSIZE))
+    board = SimpleGoBoard(size)
+    tokens = text.split()
+    if len(tokens) % 2 != 0:
+        raise ValueError("move list must be color and move pairs")
+    for i in range(0, len(tokens), 2):
+        color = player_color(tokens[i])
+        coord = move_to_coord(tokens[i + 1], size)
+        if coord == PASS:
+            raise ValueError("illegal move: \"{}\" pass is not a Gomoku "
+                             "move".format(tokens[i + 1]))
+        row, col = coord
+        if not board.play_move_gomoku(coord_to_point(row, col, size), color):
+            raise ValueError("illegal move: \"{}\" occupied".format(
+                             tokens[i + 1]))
+    return board, board.current_player
+
+
+def player_color(text):
+    """ BLACK or WHITE for b or w, else ValueError """
+    color = COLORS.get(text.lower())
+    if color is None:
+        raise ValueError("color must be b or w, not \"{}\"".format(text))
+    return color
+
+
+def parse_position(text, size):
+    if is_board_string(text.split()[0]):
+        return board_from_string(text)
+    return board_from_moves(text, size)
+
+
+def solve_line(index, text, size, time_limit):
+    """
+    Parse and solve one position. Runs in a worker process.
+    Returns the JSON record for the position, with an error instead of
+    a result if the position cannot be read or solved.
+    """
+    record = {"index": index, "position": text}
+    start = time.time()
+    try:
+        board, color = parse_position(text, size)
+    except (ValueError, KeyError) as e:
+        record["error"] = str(e)
+        return record
+    try:
+        win, move = Minimax(board, SEARCH_DEPTH, color, None, None,
+                            time_limit)
+    except Exception as e:
+        record["error"] = "{}: {}".format(type(e).__name__, e)
+        return record
+    result = solve_result(win, move, color, board.size)
+    record["to_play"] = int_to_color(color)
+    record["result"] = result
+    parts = result.split()
+    record["move"] = parts[1] if len(parts) > 1 else None
+    record["time"] = round(time.time() - start, 4)
+    return record
+
+
+def read_positions(lines):
+    """
+    Yield (index, position) for the position lines of the input
+    """
+    for index, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and line[0] != '#':
+            yield index, line
+
+
+def read_record_positions(path, every_move = False):
+    """
+    Yield (index, position) for the games of a record file.
+    index is "game:move", counting both from 1.
+    """
+    for game, record in enumerate(read_records(path), 1):
+        if every_move:
+            for move, board in enumerate(record.positions(), 1):
+                yield "{}:{}".format(game, move), board_to_string(board)
+        else:
+            yield "{}:{}".format(game, len(record.moves)), \
+                  board_to_string(record.board())
+
+
+def solve_positions(positions, size = 7, time_limit = 1, workers = None):
+    """
+    Solve (index, position) pairs in parallel.
+    Yields result records as they finish. At most a few positions per
+    worker are in flight, so the input is read lazily.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    limit = 4 * workers
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        # (index, position) of every future, for the error records
+        pending = {}
+        for index, text in positions:
+            future = executor.submit(solve_line, index, text, size,
+                                     time_limit)
+            pending[future] = index, text
+            if len(pending) >= limit:
+                done, _ = wait(pending, return_when = FIRST_COMPLETED)
+                for future in done:
+                    yield future_record(future, *pending.pop(future))
+        for future in as_completed(list(pending)):
+            yield future_record(future, *pending.pop(future))
+
+
+def future_record(future, index, text):
+    """
+    The record of a finished solve_line future, or an error record if
+    the worker failed
+    """
+    try:
+        return future.result()
+    except Exception as e:
+        return {"index": index, "position": text,
+                "error": "{}: {}".format(type(e).__name__, e)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Solve a file of positions in parallel")
+    parser.add_argument("input", help="file of positions, - for stdin")
+    parser.add_argument("--size", type=int, default=7,
+                        help="board size for move lists")
+    parser.add_argument("--timelimit", type=float, default=1,
+                        help="time limit per position in seconds")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes, by default one per CPU")
+    parser.add_argument("--output", help="JSON lines output, default stdout")
+    parser.add_argument("--every-move", action="store_true",
+                        help="solve every position of game records")
+    args = parser.parse_args(argv)
+
+    infile = None
+    if args.input.endswith(RECORD_EXTENSIONS):
+        positions = read_record_positions(args.input, args.every_move)
+    else:
+        infile = sys.stdin if args.input == '-' else open(args.input)
+        positions = read_positions(infile)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for record in solve_positions(positions, args.size,
+                                      args.timelimit, args.workers):
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+    finally:
+        if infile is not None and infile is not sys.stdin:
+            infile.close()
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
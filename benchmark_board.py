@@ -0,0 +1,214 @@
+#!/usr/bin/python3
+"""
+benchmark_board.py
+Micro-benchmarks for the SimpleGoBoard primitives used by the solver
+and the GTP commands.
+
+Every primitive is run on randomized positions for each board size
+and reported in operations per second.
+
+Usage:
+    python3 benchmark_board.py [--sizes 7 9 13 15 19] [--positions N]
+                               [--seconds S] [--seed N] [--json out.json]
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from board_util import GoBoardUtil, BLACK, WHITE
+from simple_board import SimpleGoBoard
+
+DEFAULT_SIZES = [7, 9, 13, 15, 19]
+# number of moves per position used for the move benchmarks
+MOVE_SAMPLE = 20
+
+
+def random_gomoku_position(size, rng):
+    """
+    Board of given size with a random number of stones played
+    alternately by black and white on random points
+    """
+    board = SimpleGoBoard(size)
+    moves = list(board.get_empty_points())
+    rng.shuffle(moves)
+    count = rng.randint(0, len(moves) * 6 // 10)
+    color = BLACK
+    for move in moves[:count]:
+        board.play_move_gomoku(move, color)
+        color = GoBoardUtil.opponent(color)
+    return board
+
+
+def random_go_position(size, rng):
+    """
+    Board of given size reached by random legal Go moves
+    """
+    board = SimpleGoBoard(size)
+    count = rng.randint(0, size * size // 2)
+    color = BLACK
+    for _ in range(count):
+        moves = list(board.get_empty_points())
+        rng.shuffle(moves)
+        for move in moves:
+            if board.play_move(move, color):
+                break
+        color = GoBoardUtil.opponent(color)
+    return board
+
+
+def sample_moves(board, rng):
+    moves = list(board.get_empty_points())
+    rng.shuffle(moves)
+    return moves[:MOVE_SAMPLE]
+
+
+def measure(run, ops, seconds):
+    """
+    Call run() repeatedly for at least the given number of seconds,
+    after one untimed call that pays for imports and lazily built
+    tables. Each call performs ops operations.
+    Returns operations per second.
+    """
+    run()
+    count = 0
+    start = time.perf_counter()
+    while True:
+        run()
+        count += ops
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+def bench_size(size, positions, seconds, rng):
+    """
+    Run all primitives on randomized positions of one board size.
+    Returns a dict from primitive name to operations per second.
+    """
+    gomoku = [random_gomoku_position(size, rng) for _ in range(positions)]
+    go = [random_go_position(size, rng) for _ in range(positions)]
+    gomoku_moves = [(b, sample_moves(b, rng)) for b in gomoku]
+    go_moves = [(b, sample_moves(b, rng)) for b in go]
+    stones = [(b, [p for p in range(b.maxpoint)
+                   if b.board[p] == BLACK or b.board[p] == WHITE])
+              for b in gomoku]
+
+    def count(pairs):
+        return max(1, sum(len(moves) for _, moves in pairs))
+
+    def play_undo_move_gomoku():
+        for b, moves in gomoku_moves:
+            color = b.current_player
+            for move in moves:
+                b.play_move_gomoku(move, color)
+                b.undo_move_gomoku(move, color)
+
+    def is_legal_gomoku():
+        for b, moves in gomoku_moves:
+            for move in moves:
+                b.is_legal_gomoku(move, BLACK)
+
+    def get_empty_points():
+        for b in gomoku:
+            b.get_empty_points()
+
+    def check_game_end_gomoku():
+        for b in gomoku:
+            b.check_game_end_gomoku()
+
+    def point_check_gomoku_heuristic():
+        for b, points in stones:
+            for point in points:
+                b.point_check_gomoku_heuristic(point)
+
+    def heuristic_solve():
+        for b in gomoku:
+            b.heuristic_solve()
+
+    def pattern_solve():
+        for b in gomoku:
+            b.pattern_solve()
+
+    def score_moves():
+        for b in gomoku:
+            b.score_moves(b.current_player)
+
+    def copy():
+        for b in gomoku:
+            b.copy()
+
+    def is_legal():
+        for b, moves in go_moves:
+            for move in moves:
+                b.is_legal(move, b.current_player)
+
+    results = {}
+    # each op plays a move and takes it back, which keeps the positions
+    results["play+undo_move_gomoku"] = measure(play_undo_move_gomoku,
+                                               count(gomoku_moves), seconds)
+    results["is_legal_gomoku"] = measure(is_legal_gomoku,
+                                         count(gomoku_moves), seconds)
+    results["get_empty_points"] = measure(get_empty_points,
+                                          positions, seconds)
+    results["check_game_end_gomoku"] = measure(check_game_end_gomoku,
+                                               positions, seconds)
+    results["point_check_gomoku_heuristic"] = measure(
+        point_check_gomoku_heuristic, count(stones), seconds)
+    results["heuristic_solve"] = measure(heuristic_solve, positions, seconds)
+    results["pattern_solve"] = measure(pattern_solve, positions, seconds)
+    results["score_moves"] = measure(score_moves, positions, seconds)
+    results["copy"] = measure(copy, positions, seconds)
+
+    # play_move changes the board, so each sampled move is played on
+    # its own copy, made outside the timing
+    total = 0
+    elapsed = 0.0
+    while elapsed < seconds:
+        go_copies = [(b.copy(), move) for b, moves in go_moves
+                     for move in moves]
+        start = time.perf_counter()
+        for b, move in go_copies:
+            b.play_move(move, b.current_player)
+        elapsed += time.perf_counter() - start
+        total += len(go_copies)
+    results["play_move"] = total / elapsed if elapsed > 0 else 0.0
+    results["is_legal"] = measure(is_legal, count(go_moves), seconds)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks for SimpleGoBoard primitives")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--positions", type=int, default=20,
+                        help="random positions per board size")
+    parser.add_argument("--seconds", type=float, default=0.5,
+                        help="minimum run time per primitive and size")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    results = {}
+    for size in args.sizes:
+        results[size] = bench_size(size, args.positions, args.seconds, rng)
+
+    names = list(results[args.sizes[0]].keys())
+    sys.stdout.write("{:<30}".format("ops/sec") +
+                     "".join("{:>12}".format("{0}x{0}".format(size))
+                             for size in args.sizes) + "\n")
+    for name in names:
+        sys.stdout.write("{:<30}".format(name) +
+                         "".join("{:>12.0f}".format(results[size][name])
+                                 for size in args.sizes) + "\n")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({str(size): r for size, r in results.items()}, f,
+                      indent=1)
+
+
+if __name__ == '__main__':
+    main()
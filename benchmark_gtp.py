@@ -0,0 +1,209 @@
+#!/usr/bin/python3
+"""
+benchmark_gtp.py
+Run GoGui regression files (.gtp) through GtpConnection in-process,
+check each #?[...] expectation and time every numbered command.
+
+Usage:
+    python3 benchmark_gtp.py [file.gtp ...] [--json out.json]
+                             [--save-baseline base.json]
+                             [--baseline base.json]
+
+Without file arguments the regression files shipped with the
+repository are used.
+The JSON output holds one record per test with the file, id, command,
+response, expected pattern, pass/fail, wall time and nodes searched.
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import time
+
+import gtp_connection
+from gtp_connection import GtpConnection
+from search_stats import SearchStats
+from simple_board import SimpleGoBoard
+from Gomoku import Gomoku
+
+DEFAULT_FILES = ["assignment2-public-tests.gtp",
+                 "custom-test.gtp",
+                 "custom-test-ind.gtp"]
+
+# a numbered regression command such as "10 solve"
+NUMBERED_COMMAND = re.compile(r"^(\d+)\s+(.*)$")
+# an expectation such as "#?[b C5]", optionally marked as known failure
+EXPECTATION = re.compile(r"^#\?\[(.*?)\](\*)?")
+
+
+def parse_regression_file(path):
+    """
+    Read a regression file.
+    Returns a list of [id, command, pattern, expected_fail] entries;
+    id and pattern are None for commands without them.
+    """
+    entries = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            m = EXPECTATION.match(line)
+            if m:
+                if entries and entries[-1][0] is not None:
+                    entries[-1][2] = m.group(1)
+                    entries[-1][3] = m.group(2) is not None
+                continue
+            if line[0] == '#':
+                continue
+            m = NUMBERED_COMMAND.match(line)
+            if m:
+                entries.append([m.group(1), m.group(2), None, False])
+            else:
+                entries.append([None, line, None, False])
+    return entries
+
+
+def parse_response(output):
+    """
+    Split the raw GTP output of one command into (ok, text)
+    """
+    output = output.strip('\n')
+    if output.startswith('='):
+        return True, output[1:].strip()
+    if output.startswith('?'):
+        return False, output[1:].strip()
+    return False, output.strip()
+
+
+def matches(pattern, response):
+    return re.fullmatch(pattern, response, re.IGNORECASE) is not None
+
+
+def run_file(path):
+    """
+    Feed one regression file through a fresh GtpConnection.
+    Returns a list of result records, one per numbered command.
+    """
+    gtp_connection.setGlobalTime(1)
+    out = io.StringIO()
+    con = GtpConnection(Gomoku(), SimpleGoBoard(7), outfile = out)
+    stats = SearchStats()
+    con.search_stats = stats
+    results = []
+    for test_id, command, pattern, expected_fail in parse_regression_file(path):
+        out.seek(0)
+        out.truncate()
+        stats.reset()
+        start = time.time()
+        try:
+            con.get_cmd(command)
+        except (Exception, SystemExit) as e:
+            out.write("? {}\n\n".format(e))
+        elapsed = time.time() - start
+        if test_id is None:
+            continue
+        ok, response = parse_response(out.getvalue())
+        record = {"file": os.path.basename(path),
+                  "id": test_id,
+                  "command": command,
+                  "response": response,
+                  "expected": pattern,
+                  "time": elapsed,
+                  "nodes": stats.nodes}
+        if pattern is None:
+            record["passed"] = ok
+        else:
+            record["passed"] = ok and matches(pattern, response)
+        record["expected_fail"] = expected_fail
+        results.append(record)
+    return results
+
+
+def test_key(record):
+    return "{}:{}".format(record["file"], record["id"])
+
+
+def compare(results, baseline):
+    """
+    Compare results against a saved baseline.
+    Returns lines describing per-test changes and the total.
+    """
+    old = {test_key(r): r for r in baseline}
+    lines = []
+    total_new = 0.0
+    total_old = 0.0
+    for r in results:
+        b = old.get(test_key(r))
+        if b is None:
+            lines.append("{:<40} new test".format(test_key(r)))
+            continue
+        total_new += r["time"]
+        total_old += b["time"]
+        change = ""
+        if r["passed"] != b["passed"]:
+            change = "now passes" if r["passed"] else "now FAILS"
+        lines.append("{:<40} {:8.3f}s -> {:8.3f}s {:>8} {}".format(
+                     test_key(r), b["time"], r["time"],
+                     ratio(r["time"], b["time"]), change))
+    lines.append("{:<40} {:8.3f}s -> {:8.3f}s {:>8}".format(
+                 "total", total_old, total_new, ratio(total_new, total_old)))
+    return lines
+
+
+def ratio(new, old):
+    if old <= 0:
+        return "-"
+    return "x{:.2f}".format(new / old)
+
+
+def print_results(results, out):
+    for r in results:
+        status = "pass" if r["passed"] else "FAIL"
+        if r["expected_fail"]:
+            status += " (expected)"
+        out.write("{:<40} {:<16} {:8.3f}s {:>9} nodes  {:<11} got [{}] "
+                  "expected [{}]\n".format(test_key(r), r["command"],
+                  r["time"], r["nodes"], status, r["response"],
+                  r["expected"] if r["expected"] is not None else ""))
+    passed = sum(1 for r in results if r["passed"])
+    total_time = sum(r["time"] for r in results)
+    total_nodes = sum(r["nodes"] for r in results)
+    out.write("{}/{} passed, {:.3f}s, {} nodes\n".format(
+              passed, len(results), total_time, total_nodes))
+
+
+def main(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(
+        description="Run .gtp regression files and time each test")
+    parser.add_argument("files", nargs="*",
+        default=[os.path.join(here, f) for f in DEFAULT_FILES])
+    parser.add_argument("--json", help="write results as JSON to this file")
+    parser.add_argument("--save-baseline",
+        help="save results as a baseline to this file")
+    parser.add_argument("--baseline",
+        help="compare results against a baseline saved earlier")
+    args = parser.parse_args(argv)
+
+    results = []
+    for path in args.files:
+        results.extend(run_file(path))
+    print_results(results, sys.stdout)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        sys.stdout.write('\n'.join(compare(results, baseline)) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+"""
+benchmark_startup.py
+Measure how quickly the Gomoku.py engine starts.
+
+Reports, over several fresh interpreters:
+- the time to import Gomoku
+- the time from starting Gomoku.py to the answer of its first command
+- whether importing Gomoku loads NumPy or the optional front ends
+
+Usage:
+    python3 benchmark_startup.py [--runs 10]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# modules that the plain engine should not need to import
+OPTIONAL_MODULES = ["numpy", "asyncio", "socketserver", "argparse"]
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import Gomoku
+print(time.perf_counter() - start)
+print(' '.join(m for m in {!r} if m in sys.modules))
+""".format(OPTIONAL_MODULES)
+
+
+def import_run():
+    """ Import time of Gomoku and the optional modules it loaded """
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT],
+                                     cwd = HERE, universal_newlines = True)
+    lines = output.split('\n')
+    return float(lines[0]), lines[1].split()
+
+
+def first_response_run():
+    """ Seconds from starting Gomoku.py to the answer of its first command """
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "Gomoku.py"], cwd = HERE,
+                               stdin = subprocess.PIPE,
+                               stdout = subprocess.PIPE,
+                               universal_newlines = True)
+    process.stdin.write("name\n")
+    process.stdin.flush()
+    process.stdout.readline()
+    elapsed = time.perf_counter() - start
+    process.communicate("quit\n")
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure the startup time of Gomoku.py")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    imports = [import_run() for _ in range(args.runs)]
+    responses = [first_response_run() for _ in range(args.runs)]
+    import_times = sorted(t for t, _ in imports)
+    loaded = sorted(set(m for _, modules in imports for m in modules))
+    responses.sort()
+    print("import Gomoku    median {:.1f} ms, min {:.1f} ms".format(
+          1000 * import_times[len(import_times) // 2],
+          1000 * import_times[0]))
+    print("first response   median {:.1f} ms, min {:.1f} ms".format(
+          1000 * responses[len(responses) // 2], 1000 * responses[0]))
+    print("optional modules loaded: {}".format(', '.join(loaded) or "none"))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,11 @@
 """
 board_util.py
 Utility functions for Go board.
+NumPy is only imported by the helpers that return NumPy arrays,
+so that the engine starts without loading it.
 """
 
-import numpy as np
+import random
 
 """
 Encoding of colors on and off a Go board.
@@ -40,6 +42,7 @@ For 1-d arrays, this is a singleton tuple.
 The [0] indexing is needed toextract the result from the singleton tuple.
 """
 def where1d(condition):
+    import numpy as np
     return np.where(condition)[0]
 
 def coord_to_point(row, col, boardsize):
@@ -99,7 +102,7 @@ class GoBoardUtil(object):
 
         Arguments
         ---------
-        board : np.array
+        board : SimpleGoBoard
             a SIZExSIZE array representing the board
         color : {'b','w'}
             the color to generate the move for.
@@ -131,7 +134,7 @@ class GoBoardUtil(object):
         moves = board.get_empty_points()
         if len(moves) == 0:
             return PASS
-        np.random.shuffle(moves)
+        random.shuffle(moves)
         return moves[0]
 
     @staticmethod       
@@ -142,13 +145,13 @@ class GoBoardUtil(object):
 
         Arguments
         ---------
-        board : np.array
+        board : SimpleGoBoard
             a 1-d array representing the board
         color : BLACK, WHITE
             the color to generate the move for.
         """
         moves = board.get_empty_points()
-        np.random.shuffle(moves)
+        random.shuffle(moves)
         for move in moves:
             legal = not (use_eye_filter and board.is_eye(move, color)) \
                     and board.is_legal(move, color)
@@ -168,6 +171,7 @@ class GoBoardUtil(object):
         Does not pad with BORDER
         Rows 1..size of goboard are copied into rows 0..size - 1 of board2d
         """
+        import numpy as np
         size = goboard.size
         board2d = np.zeros((size, size), dtype = np.int32)
         for row in range(size):
@@ -0,0 +1,238 @@
+"""
+game_record.py
+Streaming reader and writer for game records.
+
+Two formats are supported:
+- SGF, one or more games per file, such as (;GM[4]SZ[7];B[dd];W[ee])
+- a compact binary format (.gmk) for boards up to 15x15, one byte per move.
+  Each game is stored as its board size byte, then one byte per move
+  for (row - 1) * size + (col - 1), PASS_BYTE for a pass, and END_BYTE.
+  Moves alternate between black and white, starting with black.
+
+Readers are generators and never hold more than one game in memory.
+Binary files are read through mmap, so large files are not loaded.
+"""
+
+import mmap
+from board_util import GoBoardUtil, BLACK, WHITE, PASS, coord_to_point
+from simple_board import SimpleGoBoard
+
+PASS_BYTE = 254
+END_BYTE = 255
+# largest board size whose points fit in one byte
+MAX_BINARY_SIZE = 15
+# characters read from an SGF file at a time
+SGF_CHUNK = 1 << 16
+
+class GameRecord(object):
+    """
+    A game: board size and list of (color, point) moves, with point
+    a board array index or PASS
+    """
+    def __init__(self, size, moves = None, properties = None):
+        self.size = size
+        self.moves = moves if moves is not None else []
+        # root SGF properties other than the board size, such as PB or RE
+        self.properties = properties if properties is not None else {}
+
+    def positions(self):
+        """
+        Generate the board after each move.
+        The same board object is updated and yielded every time;
+        copy it to keep a position.
+        """
+        board = SimpleGoBoard(self.size)
+        for color, point in self.moves:
+            if point == PASS:
+                board.current_player = GoBoardUtil.opponent(color)
+            else:
+                board.play_move_gomoku(point, color)
+            yield board
+
+    def board(self):
+        """ Board at the end of the game """
+        board = SimpleGoBoard(self.size)
+        for board in self.positions():
+            pass
+        return board
+
+def sgf_point(value, size):
+    """ Board point of an SGF move value such as "dd", or PASS """
+    if value == "" or (value == "tt" and size <= 19):
+        return PASS
+    col = ord(value[0]) - ord('a') + 1
+    row = size - (ord(value[1]) - ord('a'))
+    return coord_to_point(row, col, size)
+
+def sgf_value(point, size):
+    """ SGF move value of a board point """
+    if point == PASS:
+        return ""
+    row, col = divmod(point, size + 1)
+    return chr(ord('a') + col - 1) + chr(ord('a') + size - row)
+
+def _sgf_nodes(f):
+    """
+    Generate the SGF tokens of f: '(' and ')' for game tree limits,
+    ';' for nodes and (name, [values]) for properties.
+    f is read in chunks.
+    """
+    name = ""
+    values = []
+    value = None
+    escape = False
+    while True:
+        chunk = f.read(SGF_CHUNK)
+        if not chunk:
+            return
+        for c in chunk:
+            if value is not None:
+                if escape:
+                    value.append(c)
+                    escape = False
+                elif c == '\\':
+                    escape = True
+                elif c == ']':
+                    values.append(''.join(value))
+                    value = None
+                else:
+                    value.append(c)
+            elif c == '[':
+                value = []
+            elif c.isalpha():
+                if values:
+                    yield name, values
+                    name = ""
+                    values = []
+                if c.isupper():
+                    name += c
+            else:
+                if values:
+                    yield name, values
+                    name = ""
+                    values = []
+                if c in "();":
+                    yield c
+
+def read_sgf(f):
+    """
+    Generate the GameRecord of every game in the SGF file f.
+    Only the main line of each game is read.
+    """
+    depth = 0
+    # the main line follows the first variation at every branch,
+    # so it ends at the first closing parenthesis
+    main_line_done = False
+    properties = {}
+    moves = []
+    for token in _sgf_nodes(f):
+        if token == '(':
+            depth += 1
+            if depth == 1:
+                properties = {}
+                moves = []
+                main_line_done = False
+        elif token == ')':
+            main_line_done = True
+            depth -= 1
+            if depth == 0:
+                size = int(properties.pop("SZ", "19"))
+                record = GameRecord(size, [], properties)
+                for color, value in moves:
+                    record.moves.append((color, sgf_point(value, size)))
+                yield record
+        elif token != ';' and not main_line_done:
+            name, values = token
+            if name in ("B", "W"):
+                moves.append((BLACK if name == "B" else WHITE, values[0]))
+            elif not moves:
+                properties[name] = values[0]
+
+def sgf_escape(value):
+    """ value as SGF property text: backslash first, then ] escaped """
+    return value.replace('\\', '\\\\').replace(']', '\\]')
+
+def write_sgf(f, record):
+    """ Write record to f as an SGF game """
+    f.write("(;GM[4]FF[4]SZ[{}]".format(record.size))
+    for name, value in record.properties.items():
+        if name not in ("GM", "FF", "SZ"):
+            f.write("{}[{}]".format(name, sgf_escape(value)))
+    for color, point in record.moves:
+        f.write(";{}[{}]".format("B" if color == BLACK else "W",
+                                 sgf_value(point, record.size)))
+    f.write(")\n")
+
+def write_binary(f, records):
+    """
+    Write records to the binary file f, opened in binary mode.
+    Colors that do not alternate are encoded with passes, which
+    read back as pass moves.
+    """
+    for record in records:
+        if record.size > MAX_BINARY_SIZE:
+            raise ValueError("binary records need a board of at most "
+                             "{0}x{0}".format(MAX_BINARY_SIZE))
+        data = bytearray([record.size])
+        to_play = BLACK
+        for color, point in record.moves:
+            if color != to_play:
+                data.append(PASS_BYTE)
+            if point == PASS:
+                data.append(PASS_BYTE)
+            else:
+                row, col = divmod(point, record.size + 1)
+                data.append((row - 1) * record.size + col - 1)
+            to_play = GoBoardUtil.opponent(color)
+        data.append(END_BYTE)
+        f.write(data)
+
+def decode_binary(data, start):
+    """
+    Decode the game starting at offset start of data.
+    Returns the GameRecord and the offset of the next game.
+    """
+    end = data.find(bytes([END_BYTE]), start)
+    if end < 0:
+        raise ValueError("unterminated game at offset {}".format(start))
+    size = data[start]
+    record = GameRecord(size)
+    color = BLACK
+    for i in range(start + 1, end):
+        code = data[i]
+        if code == PASS_BYTE:
+            point = PASS
+        else:
+            row, col = divmod(code, size)
+            point = coord_to_point(row + 1, col + 1, size)
+        record.moves.append((color, point))
+        color = GoBoardUtil.opponent(color)
+    return record, end + 1
+
+def read_binary(path):
+    """
+    Generate the GameRecord of every game in the binary file at path,
+    reading it through mmap
+    """
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file cannot be mapped
+            return
+        with data:
+            offset = 0
+            while offset < len(data):
+                record, offset = decode_binary(data, offset)
+                yield record
+
+def read_records(path):
+    """
+    Generate the games of an SGF or binary record file,
+    chosen by the file name extension
+    """
+    if path.endswith(".sgf"):
+        with open(path) as f:
+            yield from read_sgf(f)
+    else:
+        yield from read_binary(path)
@@ -0,0 +1,81 @@
+"""
+gtp_async.py
+Asynchronous front end for a GtpConnection.
+
+Standard input is read concurrently with command execution, so a stop
+command reaches the engine while a long solve or genmove is running.
+The search then returns its best-so-far result.
+Commands are still executed one at a time and in order, on a single
+worker thread, so responses keep the GTP order.
+"""
+
+import asyncio
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sys import stdin
+
+# command that interrupts the command currently running
+INTERRUPT_COMMAND = "stop"
+
+class AsyncGtpServer(object):
+
+    def __init__(self, connection, infile = stdin):
+        """
+        connection: GtpConnection executing the commands
+        infile: stream the commands are read from
+        """
+        self.connection = connection
+        self.infile = infile
+
+    def start_connection(self):
+        """
+        Serve commands until the input ends or quit is executed
+        """
+        asyncio.run(self.run())
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        worker = ThreadPoolExecutor(max_workers = 1)
+        # a daemon thread, so a reader blocked on input does not keep
+        # the process alive after quit
+        reader = threading.Thread(target = self._read_commands,
+                                  args = (loop, queue), daemon = True)
+        reader.start()
+        try:
+            while True:
+                command = await queue.get()
+                if command is None:
+                    break
+                try:
+                    await loop.run_in_executor(worker,
+                        self.connection.get_cmd, command)
+                except SystemExit:
+                    break
+        finally:
+            worker.shutdown(wait = True)
+
+    def _read_commands(self, loop, queue):
+        """
+        Queue every input line. A stop command also interrupts the
+        running command right away; its response follows in order.
+        """
+        while True:
+            line = self.infile.readline()
+            if line and command_name(line) == INTERRUPT_COMMAND:
+                self.connection.interrupt.set()
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, line or None)
+            except RuntimeError:
+                # the event loop has finished after quit
+                return
+            if not line:
+                return
+
+def command_name(line):
+    """ Name of the GTP command on line, without a regression test id """
+    elements = re.sub(r"^\d+", "", line.strip()).split()
+    if not elements:
+        return None
+    return elements[0]
@@ -6,24 +6,46 @@ Parts of this code were originally based on the gtp module
 in the Deep-Go project by Isaac Henrion and Amos Storkey 
 at the University of Edinburgh.
 """
+import os
+import random
+import threading
 import traceback
+from collections import deque
 from sys import stdin, stdout, stderr
 from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, BORDER, PASS, \
                        MAXSIZE, coord_to_point
-import numpy as np
+from simple_board import EVALUATORS
+from search_stats import SearchStats
+from search_cache import SolveCache, EvalCache, TranspositionTable, \
+                         EXACT, LOWER_BOUND, UPPER_BOUND, allocate_caches
+from ponder import Ponderer
+from move_ordering import MoveOrdering
+from time_manager import TimeManager
 import re
 import time
 
 
 TIME_LIMIT = 1
-stack = list()
-debug = list()
+# depth of the solver used by solve and genmove
+SEARCH_DEPTH = 2
+# number of boards kept by the push/undo GTP commands
+HISTORY_LIMIT = 64
 INFINITY = 9223372036854775807
 NINFINITY = -9223372036854775807
+# score of a won position in the alpha-beta search, less the number of
+# moves to the win
+WIN_SCORE = 1 << 40
+# half width of the aspiration window around the previous iteration's score
+ASPIRATION_WINDOW = 50
+# nodes between two checks of the time limit in the alpha-beta search
+CHECK_INTERVAL = 256
+# leading test number of a regression test command
+TEST_NUMBER = re.compile(r"^\d+")
 
 class GtpConnection():
 
-    def __init__(self, go_engine, board, debug_mode = False):
+    def __init__(self, go_engine, board, debug_mode = False, outfile = None,
+                 solve_cache = None, executor = None):
         """
         Manage a GTP connection for a Go-playing engine
 
@@ -33,10 +55,50 @@ class GtpConnection():
             a program that can reply to a set of GTP commandsbelow
         board: 
             Represents the current board state.
+        outfile:
+            stream that GTP responses are written to, stdout by default
+        solve_cache:
+            SolveCache to share with other connections, a new one by default
+        executor:
+            concurrent.futures executor that runs the searches of solve and
+            genmove, or None to search in this thread. Searches in the
+            executor do not use the eval cache of the connection, and
+            stop does not interrupt them: they end at their time limit
         """
         self._debug_mode = debug_mode
+        self.outfile = outfile if outfile is not None else stdout
         self.go_engine = go_engine
         self.board = board
+        self.board_history = deque(maxlen = HISTORY_LIMIT)
+        # statistics are only collected in debug mode or after search_stats on
+        self.search_stats = SearchStats() if debug_mode else None
+        self.solve_cache = solve_cache if solve_cache is not None \
+                           else SolveCache()
+        self.executor = executor
+        self.time_limit = TIME_LIMIT
+        # game clocks of time_settings and time_left, used by genmove
+        # instead of time_limit when the game has a time limit
+        self.time_manager = TimeManager()
+        # history and killer moves, kept between the searches of a game
+        self.move_ordering = MoveOrdering()
+        self.eval_cache = EvalCache()
+        self.transposition_table = TranspositionTable()
+        # memory budget of the three tables above in MB, None while they
+        # are the default dict caches
+        self.cache_memory = None
+        # profilers started by the profile and memory_profile commands
+        self.profiler = None
+        self.memory_profiler = None
+        self.profile_files = 0
+        self.ponderer = Ponderer(Minimax, self.solve_cache)
+        self.pondering = False
+        # set by an asynchronous front end to interrupt the running command
+        self.interrupt = threading.Event()
+        # responses to the gogui polling commands for the current position,
+        # dropped whenever the position changes
+        self.position_version = 0
+        self.response_cache = {}
+        self.response_version = 0
         self.commands = {
             "protocol_version": self.protocol_version_cmd,
             "quit": self.quit_cmd,
@@ -62,9 +124,21 @@ class GtpConnection():
 
             "timelimit": self.timelimit_cmd,
             "printtime": self.printtime_cmd,
+            "time_settings": self.time_settings_cmd,
+            "time_left": self.time_left_cmd,
+            "search_stats": self.search_stats_cmd,
+            "evaluator": self.evaluator_cmd,
+            "cache_memory": self.cache_memory_cmd,
+            "profile": self.profile_cmd,
+            "memory_profile": self.memory_profile_cmd,
+            "ponder": self.ponder_cmd,
+            "stop": self.stop_cmd,
             "push": self.save_board_state,
             "undo": self.undo_board,
             "solve": self.minimax_solve,
+            "pv": self.pv_cmd,
+            "analyze": self.analyze_cmd,
+            "analyze_gfx": self.analyze_gfx_cmd,
             "test": self.test
           
         }
@@ -78,7 +152,11 @@ class GtpConnection():
             "known_command": (1, 'Usage: known_command CMD_NAME'),
             "genmove": (1, 'Usage: genmove {w,b}'),
             "play": (2, 'Usage: play {b,w} MOVE'),
-            "legal_moves": (1, 'Usage: legal_moves {w,b}')
+            "legal_moves": (1, 'Usage: legal_moves {w,b}'),
+            "ponder": (1, 'Usage: ponder {on,off}'),
+            "time_settings": (3, 'Usage: time_settings MAIN_TIME '
+                                 'BYO_YOMI_TIME BYO_YOMI_STONES'),
+            "time_left": (3, 'Usage: time_left {w,b} TIME STONES')
         }
 
     def test(self, args):
@@ -87,10 +165,10 @@ class GtpConnection():
         print('\033[0m')
     
     def write(self, data):
-        stdout.write(data) 
+        self.outfile.write(data)
 
     def flush(self):
-        stdout.flush()
+        self.outfile.flush()
 
     def start_connection(self):
         """
@@ -110,9 +188,11 @@ class GtpConnection():
             return
         if command[0] == '#':
             return
+        # the ponder thread must not search while the board changes
+        self.ponderer.stop()
         # Strip leading numbers from regression tests
         if command[0].isdigit():
-            command = re.sub("^\d+", "", command).lstrip()
+            command = TEST_NUMBER.sub("", command, 1)
 
         elements = command.split()
         if not elements:
@@ -120,18 +200,25 @@ class GtpConnection():
         command_name = elements[0]; args = elements[1:]
         if self.has_arg_error(command_name, len(args)):
             return
-        if command_name in self.commands:
+        handler = self.commands.get(command_name)
+        if handler is not None:
+            # profile the command only, not the wait for the next one
+            profiler = self.profiler
+            if profiler is not None:
+                profiler.resume()
             try:
-                self.commands[command_name](args)
+                handler(args)
             except Exception as e:
                 self.debug_msg("Error executing command {}\n".format(str(e)))
                 self.debug_msg("Stack Trace:\n{}\n".
                                format(traceback.format_exc()))
                 raise e
+            finally:
+                if profiler is not None:
+                    profiler.pause()
         else:
             self.debug_msg("Unknown command: {}\n".format(command_name))
             self.error('Unknown command')
-            stdout.flush()
 
     def has_arg_error(self, cmd, argnum):
         """
@@ -150,20 +237,46 @@ class GtpConnection():
             stderr.flush()
 
     def error(self, error_msg):
-        """ Send error msg to stdout """
-        stdout.write('? {}\n\n'.format(error_msg))
-        stdout.flush()
+        """ Send error msg to the output stream """
+        self.write('? {}\n\n'.format(error_msg))
+        self.flush()
 
     def respond(self, response=''):
-        """ Send response to stdout """
-        stdout.write('= {}\n\n'.format(response))
-        stdout.flush()
+        """
+        Send response to the output stream,
+        written and flushed once per response
+        """
+        self.write('= ' + str(response) + '\n\n')
+        self.flush()
 
     def reset(self, size):
         """
         Reset the board to empty board of given size
         """
         self.board.reset(size)
+        self.move_ordering.clear()
+        self.eval_cache.clear()
+        self.transposition_table.clear()
+        self.time_manager.reset()
+        self.position_changed()
+
+    def position_changed(self):
+        """ Invalidate the responses cached for the previous position """
+        self.position_version += 1
+
+    def cached(self, name, compute):
+        """
+        Value of compute() for the current position,
+        computed once per position version
+        """
+        if self.response_version != self.position_version:
+            self.response_cache = {}
+            self.response_version = self.position_version
+        value = self.response_cache.get(name)
+        if value is None:
+            value = compute()
+            self.response_cache[name] = value
+        return value
 
     def board2d(self):
         return str(GoBoardUtil.get_twoD_board(self.board))
@@ -227,12 +340,7 @@ class GtpConnection():
         board_color = args[0].lower()
         color = color_to_int(board_color)
         moves = GoBoardUtil.generate_legal_moves(self.board, color)
-        gtp_moves = []
-        for move in moves:
-            coords = point_to_coord(move, self.board.size)
-            gtp_moves.append(format_point(coords))
-        sorted_moves = ' '.join(sorted(gtp_moves))
-        self.respond(sorted_moves)
+        self.respond(sorted_point_names(moves, self.board.size))
 
     #Heuristic Function Command for testing
     def heuristic_cmd(self, args):
@@ -252,19 +360,19 @@ class GtpConnection():
             if args[1].lower() == 'pass':
                 self.board.play_move(PASS, color)
                 self.board.current_player = GoBoardUtil.opponent(color)
+                self.position_changed()
                 self.respond()
                 return
-            coord = move_to_coord(args[1], self.board.size)
-            if coord:
+            move = name_points(self.board.size).get(board_move.lower())
+            if move is None:
+                # not a point of this board; raises the right error
+                coord = move_to_coord(args[1], self.board.size)
                 move = coord_to_point(coord[0],coord[1], self.board.size)
-            else:
-                self.error("Error executing move {} converted from {}"
-                           .format(move, args[1]))
-                return
             if not self.board.play_move_gomoku(move, color):
                 self.respond("illegal move: \"{}\" occupied".format(board_move))
                 return
-            else:
+            self.position_changed()
+            if self._debug_mode:
                 self.debug_msg("Move: {}\nBoard:\n{}\n".
                                 format(board_move, self.board2d()))
             self.respond()
@@ -284,88 +392,89 @@ class GtpConnection():
             else:
                 self.respond("resign")
             return
-        board_copy = self.board.copy()
-        is_win, move = Minimax(board_copy, 2, color)
-        if not is_win:
-            move = self.go_engine.get_move(self.board, color)
+        start = time.time()
+        time_limit = self.time_manager.budget(self.board, color)
+        is_win, move = self.search(color, time_limit)
+        self.time_manager.spend(color, time.time() - start)
+        if not is_win or move is None:
+            move = self.scored_move(color)
         if move == PASS:
             self.respond("pass")
             return
-        move_coord = point_to_coord(move, self.board.size)
-        move_as_string = format_point(move_coord)
+        move_as_string = point_names(self.board.size)[move]
         if self.board.is_legal_gomoku(move, color):
             self.board.play_move_gomoku(move, color)
+            self.position_changed()
             self.respond(move_as_string)
+            if self.pondering:
+                self.ponderer.start(self.board, color, SEARCH_DEPTH,
+                                    self.time_limit)
         else:
             self.respond("illegal move: {}".format(move_as_string))
 
+    def scored_move(self, color):
+        """
+        A move of color with the best one-ply score, chosen at random
+        among equal ones, or the move of the engine if there is none
+        """
+        moves = self.board.get_empty_points()
+        if len(moves) == 0:
+            return self.go_engine.get_move(self.board, color)
+        scores = self.board.score_moves(color)
+        best = scores.max()
+        return random.choice([move for move, score in zip(moves, scores)
+                              if score == best])
+
     def gogui_rules_game_id_cmd(self, args):
         self.respond("Gomoku")
     
     def gogui_rules_board_size_cmd(self, args):
         self.respond(str(self.board.size))
     
-    def legal_moves_cmd(self, args):
-        """
-            List legal moves for color args[0] in {'b','w'}
-            """
-        board_color = args[0].lower()
-        color = color_to_int(board_color)
-        moves = GoBoardUtil.generate_legal_moves(self.board, color)
-        gtp_moves = []
-        for move in moves:
-            coords = point_to_coord(move, self.board.size)
-            gtp_moves.append(format_point(coords))
-        sorted_moves = ' '.join(sorted(gtp_moves))
-        self.respond(sorted_moves)
+    def game_end(self):
+        """ check_game_end_gomoku, cached for the current position """
+        return self.cached("game_end", self.board.check_game_end_gomoku)
 
     def gogui_rules_legal_moves_cmd(self, args):
-        game_end,_ = self.board.check_game_end_gomoku()
+        self.respond(self.cached("legal_moves", self.legal_moves_gomoku))
+
+    def legal_moves_gomoku(self):
+        game_end,_ = self.game_end()
         if game_end:
-            self.respond()
-            return
+            return ''
         moves = GoBoardUtil.generate_legal_moves_gomoku(self.board)
-        gtp_moves = []
-        for move in moves:
-            coords = point_to_coord(move, self.board.size)
-            gtp_moves.append(format_point(coords))
-        sorted_moves = ' '.join(sorted(gtp_moves))
-        self.respond(sorted_moves)
+        return sorted_point_names(moves, self.board.size)
     
     def gogui_rules_side_to_move_cmd(self, args):
         color = "black" if self.board.current_player == BLACK else "white"
         self.respond(color)
     
     def gogui_rules_board_cmd(self, args):
+        self.respond(self.cached("board", self.board_string))
+
+    def board_string(self):
+        """ The board as rows of X, O and ., top row first """
         size = self.board.size
-        str = ''
+        rows = []
         for row in range(size-1, -1, -1):
             start = self.board.row_start(row + 1)
-            for i in range(size):
-                point = self.board.board[start + i]
-                if point == BLACK:
-                    str += 'X'
-                elif point == WHITE:
-                    str += 'O'
-                elif point == EMPTY:
-                    str += '.'
-                else:
-                    assert False
-            str += '\n'
-        self.respond(str)
+            rows.append(''.join([BOARD_CHARS[point] for point in
+                                 self.board.board[start : start + size]]))
+        rows.append('')
+        return '\n'.join(rows)
     
     def gogui_rules_final_result_cmd(self, args):
-        game_end, winner = self.board.check_game_end_gomoku()
+        self.respond(self.cached("final_result", self.final_result))
+
+    def final_result(self):
+        game_end, winner = self.game_end()
         moves = self.board.get_empty_points()
         board_full = (len(moves) == 0)
         if board_full and not game_end:
-            self.respond("draw")
-            return
+            return "draw"
         if game_end:
-            color = "black" if winner == BLACK else "white"
-            self.respond(color)
-        else:
-            self.respond("unknown")
+            return "black" if winner == BLACK else "white"
+        return "unknown"
 
     def gogui_analyze_cmd(self, args):
         self.respond("pstring/Legal Moves For ToPlay/gogui-rules_legal_moves\n"
@@ -374,56 +483,491 @@ class GtpConnection():
                      "pstring/Board Size/gogui-rules_board_size\n"
                      "pstring/Rules GameID/gogui-rules_game_id\n"
                      "pstring/Show Board/gogui-rules_board\n"
+                     "gfx/Move Scores/analyze_gfx\n"
                      )
     def timelimit_cmd(self, args):
         """
         Sets the maximum time to use for all following genmove or solve commands, 
         until it is changed by another timelimit command.
         """
-        global TIME_LIMIT
-        setGlobalTime(int(args[0]))
+        self.time_limit = int(args[0])
         self.respond('')
 
     def printtime_cmd(self, args):
-        print(TIME_LIMIT)
+        self.respond(str(self.time_limit))
+
+    def time_settings_cmd(self, args):
+        """
+        time_settings MAIN_TIME BYO_YOMI_TIME BYO_YOMI_STONES sets the
+        clocks of the game, in seconds. Byo-yomi time without byo-yomi
+        stones means no time limit, as in GTP.
+        """
+        try:
+            main_time, byo_yomi_time, byo_yomi_stones = \
+                [int(arg) for arg in args]
+        except ValueError:
+            self.error(self.argmap["time_settings"][1])
+            return
+        if main_time < 0 or byo_yomi_time < 0 or byo_yomi_stones < 0:
+            self.error(self.argmap["time_settings"][1])
+            return
+        self.time_manager.set_time(main_time, byo_yomi_time, byo_yomi_stones)
+        self.respond()
+
+    def time_left_cmd(self, args):
+        """
+        time_left COLOR TIME STONES: the clock of color has TIME seconds
+        left, for STONES moves in byo-yomi or 0 in main time
+        """
+        try:
+            color = color_to_int(args[0].lower())
+            seconds = float(args[1])
+            stones = int(args[2])
+        except (KeyError, ValueError):
+            color = None
+        if color not in (BLACK, WHITE):
+            self.error(self.argmap["time_left"][1])
+            return
+        self.time_manager.set_time_left(color, seconds, stones)
+        self.respond()
+
+    def search_stats_cmd(self, args):
+        """
+        search_stats on|off turns collection of search statistics on or off.
+        Without arguments, report the statistics of the last solve or genmove,
+        all zero with cached yes when it was answered from the solve cache.
+        """
+        if len(args) > 1:
+            self.error("Usage: search_stats [on|off]")
+            return
+        if len(args) == 1:
+            if args[0] == "on":
+                if self.search_stats is None:
+                    self.search_stats = SearchStats()
+            elif args[0] == "off":
+                self.search_stats = None
+            else:
+                self.error("Usage: search_stats [on|off]")
+                return
+            self.respond()
+            return
+        if self.search_stats is None:
+            self.error("search statistics are off")
+            return
+        hit_rate = self.search_stats.hit_rate
+        self.respond('\n' + self.search_stats.report() +
+                     "\nsolve_cache_hits {}/{} ({:.1%})".format(
+                         self.solve_cache.hits, self.solve_cache.probes,
+                         hit_rate(self.solve_cache.hits,
+                                  self.solve_cache.probes)) +
+                     "\neval_cache_hits {}/{} ({:.1%}), {} entries".format(
+                         self.eval_cache.hits, self.eval_cache.probes,
+                         hit_rate(self.eval_cache.hits,
+                                  self.eval_cache.probes),
+                         len(self.eval_cache)))
+
+    def evaluator_cmd(self, args):
+        """
+        evaluator heuristic|pattern selects the heuristic of the solver:
+        the original stone heuristic, or the line pattern scores.
+        Without arguments, report the current one.
+        """
+        if len(args) == 0:
+            self.respond(self.board.evaluator)
+            return
+        if len(args) > 1 or args[0] not in EVALUATORS:
+            self.error("Usage: evaluator [{}]".format('|'.join(EVALUATORS)))
+            return
+        self.board.evaluator = args[0]
+        self.respond()
+
+    def set_cache_memory(self, megabytes):
+        """
+        Replace the move ordering, evaluation cache and transposition
+        table by record arrays sized from a budget of megabytes
+        """
+        self.move_ordering, self.eval_cache, self.transposition_table = \
+            allocate_caches(megabytes)
+        self.cache_memory = megabytes
+
+    def cache_memory_cmd(self, args):
+        """
+        cache_memory MB sizes the search tables from a budget of MB
+        megabytes, emptying them. With or without an argument, report
+        the entries and memory of every table.
+        """
+        if len(args) > 1:
+            self.error("Usage: cache_memory [MB]")
+            return
+        if len(args) == 1:
+            try:
+                megabytes = float(args[0])
+                if megabytes <= 0:
+                    raise ValueError()
+                self.set_cache_memory(megabytes)
+            except ValueError:
+                self.error("cannot fit the search tables in {} MB"
+                           .format(args[0]))
+                return
+        tables = [("transposition_table", self.transposition_table),
+                  ("eval_cache", self.eval_cache)]
+        lines = ["{} {}/{} entries, {:.2f} MB".format(
+                     name, len(table), table.capacity,
+                     table.memory() / (1 << 20))
+                 for name, table in tables]
+        lines.append("history {:.2f} MB".format(
+                     self.move_ordering.memory() / (1 << 20)))
+        total = sum(table.memory() for _, table in tables) + \
+                self.move_ordering.memory()
+        if self.cache_memory is None:
+            budget = "no budget, dict sizes estimated"
+        else:
+            budget = "budget {:g} MB".format(self.cache_memory)
+        lines.append("total {:.2f} MB, {}".format(total / (1 << 20), budget))
+        self.respond('\n' + '\n'.join(lines))
+
+    def profile_file(self, args, extension):
+        """ The file named in args, or a new file name in the directory """
+        if len(args) > 0:
+            return args[0]
+        self.profile_files += 1
+        return "gomoku-{}-{}{}".format(os.getpid(), self.profile_files,
+                                       extension)
+
+    def profile_cmd(self, args):
+        """
+        profile start [cprofile|sample] profiles the commands that follow,
+        with cProfile (the default) or by sampling the stack.
+        profile stop [FILE] stops, writes the profile to FILE, and answers
+        with the file name and the functions that took the most time.
+        """
+        from profiling import PROFILERS
+        usage = "Usage: profile start [{}] | stop [FILE]".format(
+                '|'.join(PROFILERS))
+        if len(args) == 0 or len(args) > 2 or args[0] not in ("start", "stop"):
+            self.error(usage)
+            return
+        if args[0] == "start":
+            kind = args[1] if len(args) == 2 else "cprofile"
+            if kind not in PROFILERS:
+                self.error(usage)
+                return
+            if self.profiler is not None:
+                self.error("a profile is already running")
+                return
+            self.profiler = PROFILERS[kind]()
+            self.profiler.start()
+            self.respond()
+            return
+        if self.profiler is None:
+            self.error("no profile is running")
+            return
+        profiler = self.profiler
+        self.profiler = None
+        profiler.stop()
+        path = self.profile_file(args[1:], profiler.extension)
+        try:
+            profiler.dump(path)
+        except OSError as e:
+            self.error("cannot write {}: {}".format(path, e.strerror))
+            return
+        self.respond('\n'.join([path] + profiler.summary()))
+
+    def memory_profile_cmd(self, args):
+        """
+        memory_profile start traces memory allocations with tracemalloc.
+        memory_profile snapshot [FILE] writes a snapshot to FILE and
+        answers with the source lines that allocated the most memory,
+        or that allocated the most since the previous snapshot.
+        memory_profile stop ends the tracing.
+        """
+        usage = "Usage: memory_profile start | snapshot [FILE] | stop"
+        if len(args) == 0 or args[0] not in ("start", "snapshot", "stop") \
+           or len(args) > (2 if args[0] == "snapshot" else 1):
+            self.error(usage)
+            return
+        if args[0] == "start":
+            from profiling import MemoryProfiler
+            if self.memory_profiler is None:
+                self.memory_profiler = MemoryProfiler()
+                self.memory_profiler.start()
+            self.respond()
+            return
+        if self.memory_profiler is None:
+            self.error("memory profiling is not running")
+            return
+        if args[0] == "stop":
+            self.memory_profiler.stop()
+            self.memory_profiler = None
+            self.respond()
+            return
+        path = self.profile_file(args[1:], self.memory_profiler.extension)
+        try:
+            lines = self.memory_profiler.take(path)
+        except OSError as e:
+            self.error("cannot write {}: {}".format(path, e.strerror))
+            return
+        self.respond('\n'.join([path] + lines))
+
+    def report_search_stats(self):
+        """ Write the statistics of the last search to the debug stream """
+        if self.search_stats is not None:
+            self.debug_msg("Search: {}\n".format(self.search_stats))
 
     def save_board_state(self, args):
-        save_board(self.board)
-        
+        """
+        Push a copy of the current board onto the undo history.
+        Only the last HISTORY_LIMIT boards are kept.
+        """
+        self.board_history.append(self.board.copy())
+        self.respond()
+
     def undo_board(self, args):
-        self.board = undo();
+        """ Restore the board saved by the most recent push """
+        if len(self.board_history) == 0:
+            self.error("history is empty")
+            return
+        self.board = self.board_history.pop()
+        self.position_changed()
+        self.respond()
+
+    def search(self, color, time_limit = None):
+        """
+        Solve the current board for color to play, within time_limit
+        seconds or the time limit of the connection.
+        Results found earlier, for example by the ponder thread,
+        are taken from the solve cache.
+        """
+        if time_limit is None:
+            time_limit = self.time_limit
+        result = self.solve_cache.lookup(self.board, color, SEARCH_DEPTH)
+        if result is not None:
+            # the statistics must not report an earlier search
+            if self.search_stats is not None:
+                self.search_stats.reset()
+                self.search_stats.cached = True
+            return result
+        if self.executor is not None:
+            # the worker has no eval cache or interrupt of this
+            # connection; its statistics are copied back
+            stats = SearchStats() if self.search_stats is not None else None
+            future = self.executor.submit(solve_position, self.board.copy(),
+                         color, SEARCH_DEPTH, time_limit, stats)
+            is_win, move, stats = future.result()
+            if stats is not None:
+                self.search_stats.update_from(stats)
+                self.report_search_stats()
+        else:
+            is_win, move = Minimax(self.board.copy(), SEARCH_DEPTH, color,
+                                   self.search_stats, self.interrupt,
+                                   time_limit, self.eval_cache)
+            self.report_search_stats()
+        # an interrupted search only has a best-so-far result
+        if is_win != 4 and not self.interrupt.is_set():
+            self.solve_cache.store(self.board, color, SEARCH_DEPTH,
+                                   is_win, move)
+        return is_win, move
+
+    def ponder_cmd(self, args):
+        """
+        ponder on|off: search the opponent's likely replies in the
+        background after each genmove
+        """
+        if args[0] == "on":
+            self.pondering = True
+        elif args[0] == "off":
+            self.pondering = False
+            self.ponderer.stop()
+        else:
+            self.error("Usage: ponder {on,off}")
+            return
+        self.respond()
+
+    def stop_cmd(self, args):
+        """
+        Acknowledge a stop request.
+        The asynchronous front end interrupts the running search as soon
+        as it reads stop; the interrupt ends once stop itself is executed.
+        """
+        self.interrupt.clear()
+        self.respond()
 
     def minimax_solve(self, args):
-        depth = 2
-        win, move = Minimax(self.board.copy(), depth, self.board.current_player)
-        #DEBUG
-        #print("minimax_solve: ")
-        #print(str(GoBoardUtil.get_twoD_board(self.board)))
-        #DEBUG
-        #print(debug)
-        #print(stack)
+        color = self.board.current_player
+        win, move = self.search(color)
+        self.respond(solve_result(win, move, color, self.board.size))
 
-        #if win is 4, then solver ran out of time
-        if win == 4:
-            self.respond("unknown")
-        
-        elif win == 2:
-            if move == None:
-                self.respond(int_to_color(seslf.board.current_player))
-            else:
-                move_coord = point_to_coord(move, self.board.size)
-                move_as_string = format_point(move_coord)
-                string = int_to_color(self.board.current_player) + " " + move_as_string
-                self.respond(string)
-        elif win == 1:
-            move_coord = point_to_coord(move, self.board.size)
-            move_as_string = format_point(move_coord)
-            string = "draw " + move_as_string
-            self.respond(string)
+    def pv_cmd(self, args):
+        """
+        pv [depth]: principal variation search of the current position
+        for the player to move, deepening until the time limit or depth.
+        Answers with the depth reached, the score for the player to move
+        and the principal variation.
+        """
+        max_depth = None
+        if len(args) > 0:
+            try:
+                max_depth = int(args[0])
+            except ValueError:
+                self.error("Usage: pv [depth]")
+                return
+        color = self.board.current_player
+        self.move_ordering.age()
+        score, pv, depth = PrincipalVariation(self.board.copy(), color,
+            max_depth, self.search_stats, self.interrupt, self.time_limit,
+            self.move_ordering, self.eval_cache, self.transposition_table)
+        self.report_search_stats()
+        self.respond("depth {} score {} pv {}".format(depth,
+                     format_score(score),
+                     format_pv(pv, color, point_names(self.board.size))))
+
+    def analyze(self, max_depth, report):
+        """
+        MultiPrincipalVariation of the current position for the player
+        to move, calling report(depth, rows) after every iteration with
+        rows of (move, status, score, pv) best first
+        """
+        board = self.board.copy()
+        color = board.current_player
+        empty = len(board.get_empty_points())
+        def rows(depth, results):
+            return [(move, move_status(board, color, move, score,
+                                       depth >= empty), score, pv)
+                    for score, move, pv in results]
+        self.move_ordering.age()
+        results, depth = MultiPrincipalVariation(board, color, max_depth,
+            self.search_stats, self.interrupt, self.time_limit,
+            self.move_ordering, self.eval_cache, self.transposition_table,
+            lambda depth, results: report(depth, rows(depth, results)))
+        self.report_search_stats()
+        return depth, rows(depth, results)
+
+    def analyze_cmd(self, args):
+        """
+        analyze [depth]: score every legal move of the player to move by
+        iterative deepening, until the time limit or depth.
+        Every iteration is written to the error stream as soon as it
+        completes, as a line 'analyze depth D' and the moves with their
+        scores, best first. The answer is a line 'depth D' for the last
+        completed iteration, then one line per move, best first: the
+        move, its status (win, loss, draw or unknown), its score and its
+        principal variation.
+        """
+        max_depth = None
+        if len(args) > 1:
+            self.error("Usage: analyze [depth]")
+            return
+        if len(args) == 1:
+            try:
+                max_depth = int(args[0])
+            except ValueError:
+                max_depth = 0
+            if max_depth < 1:
+                self.error("Usage: analyze [depth]")
+                return
+        names = point_names(self.board.size)
+        color = self.board.current_player
+        def report(depth, rows):
+            stderr.write("analyze depth {} {}\n".format(depth, ' '.join(
+                         "{} {}".format(names[move], format_score(score))
+                         for move, _, score, _ in rows)))
+            stderr.flush()
+        depth, rows = self.analyze(max_depth, report)
+        lines = ["depth {}".format(depth)]
+        for move, status, score, pv in rows:
+            lines.append("{} {} {} pv {}".format(names[move], status,
+                         format_score(score), format_pv(pv, color, names)))
+        self.respond('\n'.join(lines))
+
+    def analyze_gfx_cmd(self, args):
+        """
+        Heat map of the scores of analyze, for gogui: every iteration is
+        drawn live through gogui-gfx lines on the debug stream, and the
+        answer draws the last one
+        """
+        names = point_names(self.board.size)
+        def report(depth, rows):
+            stderr.write("gogui-gfx:\n{}\n\n".format(
+                         heat_map(depth, rows, names)))
+            stderr.flush()
+        depth, rows = self.analyze(None, report)
+        self.respond(heat_map(depth, rows, names))
+
+def move_status(board, color, move, score, complete):
+    """
+    win or loss when score proves it, draw when nobody can win after
+    move or a complete search scored it 0, else unknown
+    """
+    status = format_score(score)
+    if status in ("win", "loss"):
+        return status
+    board.play_move_gomoku(move, color)
+    dead = board.is_dead_draw()
+    board.undo_move_gomoku(move, color)
+    if dead or (complete and score == 0):
+        return "draw"
+    return "unknown"
+
+def format_pv(pv, color, names):
+    """ Moves of pv, starting with color, as 'b D4 w E5 ...' """
+    moves = []
+    for move in pv:
+        moves.append(int_to_color(color) + ' ' + names[move])
+        color = opposite_color(color)
+    return ' '.join(moves)
+
+def heat_map(depth, rows, names):
+    """
+    gogui gfx of analysis rows: an influence of 1 for a win and -1 for
+    a loss, and between them other moves from the worst to the best
+    score, and the score as label on every move
+    """
+    if not rows:
+        return "TEXT depth {}, no moves".format(depth)
+    scores = [score for _, status, score, _ in rows
+              if status not in ("win", "loss")]
+    low = min(scores) if scores else 0
+    scale = max(max(scores) - low, 1) if scores else 1
+    influence = []
+    labels = []
+    for move, status, score, _ in rows:
+        if status == "win":
+            value, label = 1.0, "W"
+        elif status == "loss":
+            value, label = -1.0, "L"
         else:
-            self.respond(int_to_color(opposite_color(self.board.current_player)))
-        
-        
+            value = 1.8 * (score - low) / scale - 0.9
+            label = str(score)
+        influence.append("{} {:.2f}".format(names[move], value))
+        labels.append("{} {}".format(names[move], label))
+    return "INFLUENCE {}\nLABEL {}\nTEXT depth {}".format(
+           ' '.join(influence), ' '.join(labels), depth)
+
+def solve_result(win, move, color, boardsize):
+    """
+    Format a Minimax result for color to play as the answer of solve:
+    the winner and, if it is color, the winning move; "draw" and the
+    drawing move; or "unknown" when the solver ran out of time.
+    """
+    #if win is 4, then solver ran out of time
+    if win == 4:
+        return "unknown"
+    elif win == 2:
+        if move == None:
+            return int_to_color(color)
+        return int_to_color(color) + " " + point_names(boardsize)[move]
+    elif win == 1:
+        return "draw " + point_names(boardsize)[move]
+    else:
+        return int_to_color(opposite_color(color))
+
+def format_score(score):
+    """ Alpha-beta score as text: win or loss when proven, else the number """
+    if score >= WIN_SCORE - MAXSIZE * MAXSIZE:
+        return "win"
+    if score <= -(WIN_SCORE - MAXSIZE * MAXSIZE):
+        return "loss"
+    return str(score)
 
 def point_to_coord(point, boardsize):
     """
@@ -477,17 +1021,62 @@ def move_to_coord(point_str, board_size):
         raise ValueError("illegal move: \"{}\" wrong coordinate".format(s))
     return row, col
 
+# GTP names of the board points for each board size, built on first use
+_point_names = {}
+_name_points = {}
+_sorted_points = {}
+
+def point_names(boardsize):
+    """
+    List of GTP names such as 'A1' indexed by board point.
+    Points off the board have the name None.
+    """
+    names = _point_names.get(boardsize)
+    if names is None:
+        names = [None] * (boardsize * boardsize + 3 * (boardsize + 1))
+        for row in range(1, boardsize + 1):
+            for col in range(1, boardsize + 1):
+                point = coord_to_point(row, col, boardsize)
+                names[point] = format_point((row, col))
+        _point_names[boardsize] = names
+    return names
+
+def name_points(boardsize):
+    """ Dictionary from lower case GTP point names to board points """
+    points = _name_points.get(boardsize)
+    if points is None:
+        points = {name.lower(): point for point, name in
+                  enumerate(point_names(boardsize)) if name is not None}
+        _name_points[boardsize] = points
+    return points
+
+def sorted_point_names(points, boardsize):
+    """
+    Names of the given points separated by spaces,
+    in the sorted order of the names
+    """
+    order = _sorted_points.get(boardsize)
+    names = point_names(boardsize)
+    if order is None:
+        order = sorted(name_points(boardsize).values(),
+                       key = lambda point: names[point])
+        _sorted_points[boardsize] = order
+    selected = set(points)
+    return ' '.join([names[point] for point in order if point in selected])
+
+# characters for the points of gogui-rules_board
+BOARD_CHARS = {BLACK: 'X', WHITE: 'O', EMPTY: '.'}
+
+COLOR_TO_INT = {"b": BLACK , "w": WHITE, "e": EMPTY, "BORDER": BORDER}
+INT_TO_COLOR = {BLACK: "b" , WHITE: "w", EMPTY: "e", BORDER: "BORDER"}
+
 def color_to_int(c):
     """convert character to the appropriate integer code"""
-    color_to_int = {"b": BLACK , "w": WHITE, "e": EMPTY, 
-                    "BORDER": BORDER}
-    return color_to_int[c]
+    return COLOR_TO_INT[c]
 
 def int_to_color(n):
     """convert integer to the appropriate character code"""
-    int_to_color = {BLACK: "b" , WHITE: "w", EMPTY: "e",
-                    BORDER: "BORDER"}
-    return int_to_color[n]
+    return INT_TO_COLOR[n]
 
 def opposite_color(color):
     if color == BLACK:
@@ -495,48 +1084,129 @@ def opposite_color(color):
     elif color == WHITE:
         return BLACK
 
-def save_board(board):
-    b = board.copy()
-    stack.append(b)
-    debug.append("Stored board")
-
-def undo():
-    debug.append("Undid board")
-    if len(stack) == 0:
-        print("Stack is empty!")
-    return stack.pop()
+class SearchState(object):
+    """
+    State private to a single search.
+    Moves played by the search are recorded in a ring of move records
+    preallocated for the whole search, so taking a move back does not
+    need a copy of the board.
+    stats is an optional SearchStats collector, ordering an optional
+    MoveOrdering and eval_cache an optional EvalCache, None when not wanted.
+    """
+    def __init__(self, board, depth, stats = None, ordering = None,
+                 eval_cache = None, tt = None, stop = None, deadline = None):
+        self.depth = depth
+        self.stats = stats
+        self.ordering = ordering
+        self.eval_cache = eval_cache
+        # used by the alpha-beta search only
+        self.tt = tt
+        self.stop = stop
+        self.deadline = deadline
+        self.nodes = 0
+        self.capacity = len(board.get_empty_points()) + 1
+        self.points = [PASS] * self.capacity
+        self.players = [EMPTY] * self.capacity
+        self.top = 0
+
+    def play(self, board, point, color):
+        i = self.top % self.capacity
+        self.points[i] = point
+        self.players[i] = board.current_player
+        self.top += 1
+        board.play_move_gomoku(point, color)
+
+    def undo(self, board):
+        self.top -= 1
+        i = self.top % self.capacity
+        board.undo_move_gomoku(self.points[i], self.players[i])
+
+    def moves(self, board, color, depth):
+        """
+        Legal moves of color at the node depth plies above the leaves,
+        sorted by the move ordering if there is one.
+        Points outside every live span are left out, as a stone there
+        cannot be part of a five, unless no other point is left.
+        """
+        moves = GoBoardUtil.generate_legal_moves_gomoku(board)
+        if depth > 0:
+            live = board.live_points()
+            live_moves = [move for move in moves if move in live]
+            if live_moves:
+                moves = live_moves
+        if self.ordering is not None and depth > 0:
+            moves = self.ordering.order(moves, color, self.depth - depth)
+        return moves
+
+    def good_move(self, move, color, depth):
+        """ Record a refutation or best move for the move ordering """
+        if self.ordering is not None:
+            self.ordering.good_move(move, color, self.depth - depth, depth)
+
+    def count_node(self):
+        """
+        Count a node of the alpha-beta search, and every CHECK_INTERVAL
+        nodes raise SearchTimeout if the time is up or stop is set
+        """
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            if self.stop is not None and self.stop.is_set():
+                raise SearchTimeout()
+            if self.deadline is not None and time.time() >= self.deadline:
+                raise SearchTimeout()
+
+    def undo_all(self, board):
+        """ Take back the moves left on board by an interrupted search """
+        while self.top > 0:
+            self.undo(board)
 
 def setGlobalTime(time):
     global TIME_LIMIT
     TIME_LIMIT = time
 
 #simply returns the right move, if any
-def Minimax(board, depth, color):
+def Minimax(board, depth, color, stats = None, stop = None, time_limit = None,
+            eval_cache = None):
     start_time = time.time()
+    if time_limit is None:
+        time_limit = TIME_LIMIT
     moves = GoBoardUtil.generate_legal_moves_gomoku(board)
     best_points = 0
     best_move = None
     is_win = 0
     alpha = NINFINITY
     beta = INFINITY
+    # no move ordering: the boolean solver keeps the first best move and
+    # the first refutation it finds, so the order decides its answers
+    state = SearchState(board, depth, stats, None, eval_cache)
+    if stats is not None:
+        stats.start()
+        stats.node(0)
 
     #special case: check to see if current board already has a winner
     win, col = board.check_game_end_gomoku()
     if win == True:
         #if the opposite color already won, then return win=0
         if col == opposite_color(color):
-            return 0, None;
+            return finish_search(state, 0, None)
         #if our current winner already won, return
-    
+
+    # nobody can make five any more: every move draws, and the loop
+    # below would report the last one
+    if len(moves) > 0 and board.is_dead_draw():
+        return finish_search(state, 1, moves[-1])
+
     for move in moves:
         time_elapsed = time.time() - start_time
-        if time_elapsed >= TIME_LIMIT:
-            return 4, None
-        #DEBUG - remove later
-        print(time_elapsed)
-        save_board(board)
-        board.play_move_gomoku(move, color)
-        win, col, points = MinimaxBooleanAND(board, depth-1, opposite_color(color), alpha, beta)
+        if time_elapsed >= time_limit:
+            return finish_search(state, 4, best_move)
+        if stop is not None and stop.is_set():
+            # a win or draw found so far is the best-so-far result
+            if is_win == 0:
+                is_win = 4
+            return finish_search(state, is_win, best_move)
+        state.play(board, move, color)
+        win, col, points = MinimaxBooleanAND(board, depth-1, opposite_color(color), alpha, beta, state)
 
         #DEBUG
         #move_coord = point_to_coord(move, board.size)
@@ -555,33 +1225,53 @@ def Minimax(board, depth, color):
             is_win = 1
             best_move = move
             
-        board = undo()
+        state.undo(board)
 
+    return finish_search(state, is_win, best_move)
+
+def solve_position(board, color, depth, time_limit, stats = None):
+    """
+    Search board for color to play, for use in a worker process.
+    Returns is_win, the move and stats, filled in by the search
+    """
+    is_win, move = Minimax(board, depth, color, stats, None, time_limit)
+    return is_win, move, stats
+
+def finish_search(state, is_win, best_move):
+    if state.stats is not None:
+        if is_win != 4:
+            state.stats.iteration_done(state.depth)
+        state.stats.stop()
     return is_win, best_move
 
+def evaluate(board, has_moves, state):
+    """ StatisticallyEvaluate, counted as a leaf of the search """
+    if state.stats is not None:
+        state.stats.leaf()
+    if state.eval_cache is not None:
+        return state.eval_cache.evaluate(board, has_moves)
+    return board.StatisticallyEvaluate(has_moves)
+
 
 #minimax solver implementation ahead
-def MinimaxBooleanOR(board, depth, color, alpha, beta):
-    moves = GoBoardUtil.generate_legal_moves_gomoku(board)
+def MinimaxBooleanOR(board, depth, color, alpha, beta, state):
+    if state.stats is not None:
+        state.stats.node(state.depth - depth)
+    if board.is_dead_draw():
+        return False, None, 0
+    moves = state.moves(board, color, depth)
     best_points = 0
     is_win = False
-
-    #DEBUG - remove later
-    global TIME_LIMIT
-    print(TIME_LIMIT)
     
     #base case
     if (depth == 0 or len(moves) == 0):
-        if len(moves)==0:
-            return board.StatisticallyEvaluate(False)
-        return board.StatisticallyEvaluate()
+        return evaluate(board, len(moves) != 0, state)
         
 
     for move in moves:        
         
-        save_board(board)
-        board.play_move_gomoku(move, color)
-        win, col, points = MinimaxBooleanAND(board, depth-1, opposite_color(color), alpha, beta)
+        state.play(board, move, color)
+        win, col, points = MinimaxBooleanAND(board, depth-1, opposite_color(color), alpha, beta, state)
         
         if col != color:
             win = False
@@ -590,7 +1280,7 @@ def MinimaxBooleanOR(board, depth, color, alpha, beta):
             is_win = True
         if points > best_points:
             best_points = points
-        board = undo()
+        state.undo(board)
         
         # deal with alpha-beta
         #if best_points >= beta:
@@ -604,32 +1294,35 @@ def MinimaxBooleanOR(board, depth, color, alpha, beta):
     #print(str(GoBoardUtil.get_twoD_board(board)))
     return is_win, color, best_points
 
-def MinimaxBooleanAND(board, depth, color, alpha, beta):
-    moves = GoBoardUtil.generate_legal_moves_gomoku(board)
+def MinimaxBooleanAND(board, depth, color, alpha, beta, state):
+    if state.stats is not None:
+        state.stats.node(state.depth - depth)
+    if board.is_dead_draw():
+        return False, None, 0
+    moves = state.moves(board, color, depth)
     worst_points = 10000
     
     #base case
     if (depth == 0 or len(moves) == 0):
-        if len(moves)==0:
-            return board.StatisticallyEvaluate(False)
-        return board.StatisticallyEvaluate()
+        return evaluate(board, len(moves) != 0, state)
 
     for move in moves:
         
-        save_board(board)
-        board.play_move_gomoku(move, color)
-        win, col, points = MinimaxBooleanOR(board, depth-1, opposite_color(color), alpha, beta)
+        state.play(board, move, color)
+        win, col, points = MinimaxBooleanOR(board, depth-1, opposite_color(color), alpha, beta, state)
         
         if col != opposite_color(color):
             win = False
             points = -points
         if not win:
-            board = undo()
+            state.undo(board)
+            if state.stats is not None:
+                state.stats.cutoff()
             return False, opposite_color(color), points
         if points < worst_points:
             worst_points = points
 
-        board = undo()
+        state.undo(board)
 
         # deal with alpha-beta values
         #if worst_points <= alpha:
@@ -644,6 +1337,200 @@ def MinimaxBooleanAND(board, depth, color, alpha, beta):
     #print(str(GoBoardUtil.get_twoD_board(board)))
     return True, opposite_color(color), worst_points
 
+class SearchTimeout(Exception):
+    """ Raised in the alpha-beta search when it runs out of time """
+
+def PrincipalVariation(board, color, max_depth = None, stats = None,
+                       stop = None, time_limit = None, ordering = None,
+                       eval_cache = None, tt = None):
+    """
+    Iterative deepening principal variation search of board for color.
+    Iterations after the first search a window of ASPIRATION_WINDOW
+    around the previous score, and search again with the window open
+    on the side the score fell out of.
+    Returns (score, pv, depth) of the last completed iteration, with
+    pv the list of moves of the principal variation.
+    """
+    if time_limit is None:
+        time_limit = TIME_LIMIT
+    if max_depth is None:
+        max_depth = len(board.get_empty_points())
+    if tt is None:
+        tt = TranspositionTable()
+    deadline = time.time() + time_limit
+    if stats is not None:
+        stats.start()
+    score, pv, depth = 0, [], 0
+    for iteration_depth in range(1, max_depth + 1):
+        state = SearchState(board, iteration_depth, stats, ordering,
+                            eval_cache, tt, stop, deadline)
+        if iteration_depth == 1 or format_score(score) in ("win", "loss"):
+            alpha, beta = NINFINITY, INFINITY
+        else:
+            alpha = score - ASPIRATION_WINDOW
+            beta = score + ASPIRATION_WINDOW
+        try:
+            while True:
+                line = []
+                value = PrincipalVariationSearch(board, iteration_depth,
+                            color, alpha, beta, state, line)
+                if value <= alpha:
+                    alpha = NINFINITY
+                elif value >= beta:
+                    beta = INFINITY
+                else:
+                    break
+        except SearchTimeout:
+            state.undo_all(board)
+            break
+        score, pv, depth = value, line, iteration_depth
+        if stats is not None:
+            stats.iteration_done(depth)
+        if format_score(score) in ("win", "loss"):
+            break
+    if stats is not None:
+        stats.stop()
+    return score, pv, depth
+
+def PrincipalVariationSearch(board, depth, color, alpha, beta, state, pv):
+    """
+    Negamax alpha-beta score of board for color to play, depth plies deep.
+    Moves after the first are searched with a null window, and searched
+    again with the full window only when they turn out better.
+    pv is filled with the principal variation.
+    """
+    ply = state.depth - depth
+    if state.stats is not None:
+        state.stats.node(ply)
+    state.count_node()
+    win, winner = board.pattern_game_end()
+    if win:
+        if winner == color:
+            return WIN_SCORE - ply
+        return ply - WIN_SCORE
+    if board.is_dead_draw():
+        return 0
+    moves = state.moves(board, color, depth)
+    if len(moves) == 0:
+        return 0
+    if depth == 0:
+        win, winner, points = evaluate(board, True, state)
+        if not win:
+            return 0
+        return points if winner == color else -points
+
+    entry = state.tt.lookup(board, color)
+    if state.stats is not None:
+        state.stats.tt_probe(entry is not None)
+    if entry is not None:
+        entry_depth, score, kind, tt_move = entry
+        # nodes searched with an open window do not stop at the table,
+        # so that they give the whole principal variation
+        if entry_depth >= depth and beta - alpha == 1:
+            if kind == EXACT or (kind == LOWER_BOUND and score >= beta) \
+               or (kind == UPPER_BOUND and score <= alpha):
+                pv[:] = [tt_move] if tt_move is not None else []
+                return score
+        if tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+
+    original_alpha = alpha
+    best_score = NINFINITY
+    best_move = None
+    opponent = opposite_color(color)
+    for i, move in enumerate(moves):
+        line = []
+        state.play(board, move, color)
+        if i == 0:
+            score = -PrincipalVariationSearch(board, depth - 1, opponent,
+                                              -beta, -alpha, state, line)
+        else:
+            score = -PrincipalVariationSearch(board, depth - 1, opponent,
+                                              -alpha - 1, -alpha, state, line)
+            if alpha < score < beta:
+                line = []
+                score = -PrincipalVariationSearch(board, depth - 1, opponent,
+                                                  -beta, -alpha, state, line)
+        state.undo(board)
+        if score > best_score:
+            best_score = score
+            best_move = move
+        if score > alpha:
+            alpha = score
+            pv[:] = [move] + line
+        if alpha >= beta:
+            if state.stats is not None:
+                state.stats.cutoff()
+            state.good_move(move, color, depth)
+            break
+
+    if best_score <= original_alpha:
+        kind = UPPER_BOUND
+    elif best_score >= beta:
+        kind = LOWER_BOUND
+    else:
+        kind = EXACT
+    state.tt.store(board, color, depth, best_score, kind, best_move)
+    return best_score
+
+def MultiPrincipalVariation(board, color, max_depth = None, stats = None,
+                            stop = None, time_limit = None, ordering = None,
+                            eval_cache = None, tt = None, report = None):
+    """
+    Iterative deepening search of every legal move of color on board.
+    Each move is searched with the full window, so all of their scores
+    are exact; the moves are searched best first by the scores of the
+    previous iteration, sharing the transposition table.
+    After each completed iteration, report(depth, results) is called
+    if given. Returns (results, depth) of the last completed iteration,
+    with results a list of (score, move, pv) for color, best first.
+    """
+    if time_limit is None:
+        time_limit = TIME_LIMIT
+    moves = GoBoardUtil.generate_legal_moves_gomoku(board)
+    if max_depth is None:
+        max_depth = len(moves)
+    if tt is None:
+        tt = TranspositionTable()
+    if board.pattern_game_end()[0] or len(moves) == 0:
+        return [], 0
+    deadline = time.time() + time_limit
+    if stats is not None:
+        stats.start()
+    opponent = opposite_color(color)
+    results, depth = [], 0
+    for iteration_depth in range(1, max_depth + 1):
+        state = SearchState(board, iteration_depth, stats, ordering,
+                            eval_cache, tt, stop, deadline)
+        iteration = []
+        try:
+            for move in moves:
+                line = []
+                state.play(board, move, color)
+                score = -PrincipalVariationSearch(board, iteration_depth - 1,
+                            opponent, NINFINITY, INFINITY, state, line)
+                state.undo(board)
+                iteration.append((score, move, [move] + line))
+        except SearchTimeout:
+            state.undo_all(board)
+            break
+        # sorted is stable, so equal moves keep the order of the last
+        # iteration
+        results = sorted(iteration, key = lambda result: -result[0])
+        depth = iteration_depth
+        moves = [move for _, move, _ in results]
+        if stats is not None:
+            stats.iteration_done(depth)
+        if report is not None:
+            report(depth, results)
+        if all(format_score(score) in ("win", "loss")
+               for score, _, _ in results):
+            break
+    if stats is not None:
+        stats.stop()
+    return results, depth
+
 def alert(message):
         print('\033[91m')
         print(message)
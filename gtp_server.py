@@ -0,0 +1,123 @@
+"""
+gtp_server.py
+Serve many GTP sessions from one process, over a TCP or Unix socket.
+
+Every connection to the socket is a GTP session with its own board.
+All sessions share the engine, the solve cache and a pool of worker
+processes that run the searches of solve and genmove, so concurrent
+games do not each need their own Python process.
+"""
+
+import os
+import socketserver
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from gtp_connection import GtpConnection
+from search_cache import SolveCache
+from simple_board import SimpleGoBoard
+
+# memory budget in MB of the search tables of each session, unless the
+# server is given another; the default dict tables could take ~90 MB
+SESSION_CACHE_MEMORY = 16
+
+class GtpSessionHandler(socketserver.BaseRequestHandler):
+    """
+    Run one GTP session on an accepted socket connection
+    """
+    def handle(self):
+        server = self.server
+        infile = self.request.makefile('r')
+        outfile = self.request.makefile('w')
+        con = GtpConnection(server.engine, SimpleGoBoard(server.boardsize),
+                            outfile = outfile,
+                            solve_cache = server.solve_cache,
+                            executor = server.executor)
+        con.set_cache_memory(server.cache_memory)
+        try:
+            for line in infile:
+                try:
+                    con.get_cmd(line)
+                except ConnectionError:
+                    raise
+                except Exception as e:
+                    # a failed command is answered and logged, and the
+                    # session goes on
+                    traceback.print_exc()
+                    con.error("{}: {}".format(type(e).__name__, e))
+        except SystemExit:
+            # quit ends this session only
+            pass
+        except ConnectionError:
+            # the client went away
+            pass
+        finally:
+            con.ponderer.stop()
+            try:
+                outfile.close()
+            except ConnectionError:
+                pass
+            infile.close()
+
+class SharedEngineMixin(object):
+    """
+    State shared by all sessions of a server
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def setup_shared(self, engine, boardsize, workers, cache_memory):
+        self.engine = engine
+        self.cache_memory = cache_memory if cache_memory is not None \
+                            else SESSION_CACHE_MEMORY
+        self.boardsize = boardsize
+        self.solve_cache = SolveCache()
+        self.executor = ProcessPoolExecutor(max_workers = workers)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait = False)
+
+class TcpGtpServer(SharedEngineMixin, socketserver.ThreadingTCPServer):
+
+    def __init__(self, address, engine, boardsize = 7, workers = None,
+                 cache_memory = None):
+        socketserver.ThreadingTCPServer.__init__(self, address,
+                                                 GtpSessionHandler)
+        self.setup_shared(engine, boardsize, workers, cache_memory)
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class UnixGtpServer(SharedEngineMixin,
+                        socketserver.ThreadingUnixStreamServer):
+
+        def __init__(self, path, engine, boardsize = 7, workers = None,
+                     cache_memory = None):
+            socketserver.ThreadingUnixStreamServer.__init__(self, path,
+                GtpSessionHandler)
+            self.setup_shared(engine, boardsize, workers, cache_memory)
+
+        def server_close(self):
+            super().server_close()
+            if os.path.exists(self.server_address):
+                os.unlink(self.server_address)
+
+def serve(engine, host = "127.0.0.1", port = None, unix_path = None,
+          workers = None, cache_memory = None):
+    """
+    Serve GTP sessions until interrupted.
+    Listens on unix_path if given, else on host:port.
+    workers is the size of the search process pool, by default
+    the number of CPUs. cache_memory is the memory budget in MB of the
+    search tables of each session, SESSION_CACHE_MEMORY by default.
+    """
+    if unix_path is not None:
+        server = UnixGtpServer(unix_path, engine, workers = workers,
+                               cache_memory = cache_memory)
+    else:
+        server = TcpGtpServer((host, port), engine, workers = workers,
+                              cache_memory = cache_memory)
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
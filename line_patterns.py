@@ -0,0 +1,209 @@
+"""
+line_patterns.py
+Precomputed line pattern scores for the Gomoku evaluation.
+
+Every line of the board (row, column or diagonal) of at least 5 points
+is padded with a BORDER cell at both ends and cut into overlapping
+windows of WINDOW cells. The contents of a window are encoded as a
+base 4 integer, cell k counting color * 4**k, so a move changes the
+codes of the windows through its point by a single addition.
+The scores and threats of a window for both colors are looked up in
+a table covering all codes, packed into one integer, and the board
+keeps the sum of the packed values of its windows.
+
+The first five cells of a window are its span. Every five points in a
+row on the board are the span of exactly one window, so the packed sum
+also counts the live spans of each color: spans without a stone of the
+other color, where the color can still make five.
+
+score_arrays and incidence_arrays hold the same tables as NumPy arrays
+for scoring all the empty points of a board at once. NumPy is only
+imported when they are first used.
+"""
+
+from board_util import BLACK, WHITE, EMPTY, BORDER
+
+WINDOW = 6
+# values of the patterns of a color in a window; the score of a window
+# is the value of its best pattern
+FIVE = 100000
+OPEN_FOUR = 5000
+FOUR = 1000
+OPEN_THREE = 500
+THREE = 100
+OPEN_TWO = 50
+TWO = 10
+ONE = 1
+# value of a five-cell part of a window by its number of stones
+SPAN_VALUES = [0, ONE, TWO, THREE, FOUR, FIVE]
+# value of the four inner cells between two empty ends by number of stones
+OPEN_VALUES = [0, 0, OPEN_TWO, OPEN_THREE, OPEN_FOUR]
+# layout of a packed value: for each color, COLOR_BITS bits holding the
+# score, then the number of windows with a five, a four (open or not)
+# and an open four, and the number of live spans.
+# The fields are large enough for a 25x25 board.
+SCORE_BITS = 32
+COUNT_BITS = 12
+FIVES_SHIFT = SCORE_BITS
+FOURS_SHIFT = SCORE_BITS + COUNT_BITS
+OPEN_FOURS_SHIFT = SCORE_BITS + 2 * COUNT_BITS
+LIVE_SHIFT = SCORE_BITS + 3 * COUNT_BITS
+COLOR_BITS = SCORE_BITS + 4 * COUNT_BITS
+THREAT_COUNTS = {FIVE: 1 << FIVES_SHIFT,
+                 OPEN_FOUR: (1 << FOURS_SHIFT) + (1 << OPEN_FOURS_SHIFT),
+                 FOUR: 1 << FOURS_SHIFT}
+
+def pattern_value(cells):
+    """
+    Value of the best pattern in a window, with cells 1 for the stones
+    of the color, 0 for empty and 2 for anything else
+    """
+    value = 0
+    for start in range(WINDOW - 4):
+        span = cells[start : start + 5]
+        if 2 not in span:
+            value = max(value, SPAN_VALUES[span.count(1)])
+    inner = cells[1 : WINDOW - 1]
+    if cells[0] == 0 and cells[-1] == 0 and 2 not in inner:
+        value = max(value, OPEN_VALUES[inner.count(1)])
+    return value
+
+def build_tables():
+    """
+    Tables of the packed value of every window code, and of whether
+    its span is live for either color
+    """
+    # value of every window of cells 0, 1 or 2, indexed in base 3,
+    # with the live span count added
+    values = []
+    for key in range(3 ** WINDOW):
+        cells = []
+        for _ in range(WINDOW):
+            key, cell = divmod(key, 3)
+            cells.append(cell)
+        value = pattern_value(cells)
+        value += THREAT_COUNTS.get(value, 0)
+        if 2 not in cells[:5]:
+            value += 1 << LIVE_SHIFT
+        values.append(value)
+    table = [0] * 4 ** WINDOW
+    for color in [BLACK, WHITE]:
+        classes = [0 if c == EMPTY else 1 if c == color else 2
+                   for c in range(4)]
+        # base 3 key of every code, built one cell at a time
+        keys = [0]
+        for k in range(WINDOW):
+            keys = [key + classes[c] * 3 ** k for c in range(4)
+                    for key in keys]
+        shift = (color - 1) * COLOR_BITS
+        for code, key in enumerate(keys):
+            table[code] += values[key] << shift
+    live_mask = (1 << LIVE_SHIFT) | (1 << (COLOR_BITS + LIVE_SHIFT))
+    live_spans = [table[code] & live_mask != 0 for code in range(4 ** WINDOW)]
+    return table, live_spans
+
+PATTERNS, LIVE_SPANS = build_tables()
+
+def _field(patterns, color, shift, bits):
+    return (patterns >> ((color - 1) * COLOR_BITS + shift)) & ((1 << bits) - 1)
+
+def pattern_score(patterns, color):
+    """ Sum of the window scores of color in packed patterns """
+    return _field(patterns, color, 0, SCORE_BITS)
+
+def fives(patterns, color):
+    return _field(patterns, color, FIVES_SHIFT, COUNT_BITS)
+
+def fours(patterns, color):
+    return _field(patterns, color, FOURS_SHIFT, COUNT_BITS)
+
+def open_fours(patterns, color):
+    return _field(patterns, color, OPEN_FOURS_SHIFT, COUNT_BITS)
+
+def live_spans(patterns, color):
+    return _field(patterns, color, LIVE_SHIFT, COUNT_BITS)
+
+# window layouts for each board size, shared by all boards of that size
+_window_tables = {}
+
+def board_lines(size):
+    """ Lists of the points of every line of at least 5 points """
+    NS = size + 1
+    on_board = lambda row, col: 1 <= row <= size and 1 <= col <= size
+    lines = []
+    for drow, dcol in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+        for row in range(1, size + 1):
+            for col in range(1, size + 1):
+                if on_board(row - drow, col - dcol):
+                    continue
+                line = []
+                r, c = row, col
+                while on_board(r, c):
+                    line.append(r * NS + c)
+                    r += drow
+                    c += dcol
+                if len(line) >= 5:
+                    lines.append(line)
+    return lines
+
+def window_table(size, maxpoint):
+    """
+    Window layout of a board of given size.
+    Returns (codes, point_windows, patterns, span_points): the codes of
+    the windows of the empty board, for every board point the list of
+    (window, weight) pairs of the windows through it, the packed sum of
+    the empty board, and the points of the span of every window.
+    """
+    if size not in _window_tables:
+        codes = []
+        point_windows = [[] for _ in range(maxpoint)]
+        span_points = []
+        for line in board_lines(size):
+            cells = [None] + line + [None]
+            for start in range(len(cells) - WINDOW + 1):
+                window = len(codes)
+                code = 0
+                for k in range(WINDOW):
+                    point = cells[start + k]
+                    if point is None:
+                        code += BORDER * 4 ** k
+                    else:
+                        point_windows[point].append((window, 4 ** k))
+                codes.append(code)
+                span_points.append([p for p in cells[start : start + 5]
+                                    if p is not None])
+        patterns = sum(PATTERNS[code] for code in codes)
+        _window_tables[size] = (codes, point_windows, patterns, span_points)
+    return _window_tables[size]
+
+_score_arrays = []
+_incidence_arrays = {}
+
+def score_arrays():
+    """
+    NumPy array of the window score of every code, indexed by
+    [color][code]
+    """
+    if not _score_arrays:
+        import numpy as np
+        scores = np.zeros((WHITE + 1, 4 ** WINDOW), dtype = np.int64)
+        for color in [BLACK, WHITE]:
+            scores[color] = [pattern_score(value, color)
+                             for value in PATTERNS]
+        _score_arrays.append(scores)
+    return _score_arrays[0]
+
+def incidence_arrays(size, maxpoint, points):
+    """
+    The window table of a board size as NumPy arrays of all (point,
+    window) pairs of a point in a window: the index of the point in
+    points, the window and the weight of the point in its code
+    """
+    if size not in _incidence_arrays:
+        import numpy as np
+        _, point_windows, _, _ = window_table(size, maxpoint)
+        pairs = [(i, window, weight) for i, point in enumerate(points)
+                 for window, weight in point_windows[point]]
+        pairs = np.array(pairs, dtype = np.int64).reshape(-1, 3)
+        _incidence_arrays[size] = (pairs[:, 0], pairs[:, 1], pairs[:, 2])
+    return _incidence_arrays[size]
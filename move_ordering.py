@@ -0,0 +1,116 @@
+"""
+move_ordering.py
+History and killer move heuristics for ordering the moves of the
+alpha-beta searches. The boolean solver of solve and genmove does not
+use them, as its answer is the first win or refutation it finds in
+board order.
+
+Moves that refuted other moves are tried first:
+- killer moves, the last KILLER_SLOTS refutations found at the same ply
+- then moves by their history score, which grows each time the move
+  refutes a move or is the best move of a node, more so near the root.
+The tables are kept between the searches of a game, and aged
+before each new search so that old results weigh less.
+
+RecordMoveOrdering keeps the history scores in a preallocated NumPy
+array covering the largest board instead of dicts.
+"""
+
+from board_util import BLACK, WHITE, MAXSIZE
+from search_cache import dict_memory
+
+KILLER_SLOTS = 2
+
+class MoveOrdering(object):
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """ Forget everything, for a new game """
+        # history scores by [color][point], grown as boards are seen
+        self.history = {BLACK: {}, WHITE: {}}
+        # killer moves by ply, most recent first
+        self.killers = []
+
+    def age(self):
+        """
+        Halve the history scores before a new search of the same game.
+        The killers of the previous search are kept.
+        """
+        for table in self.history.values():
+            for point in list(table):
+                score = table[point] >> 1
+                if score:
+                    table[point] = score
+                else:
+                    del table[point]
+
+    def order(self, moves, color, ply):
+        """
+        Moves sorted killers first, then by history score.
+        Moves that are neither keep their order.
+        """
+        history = self.history[color]
+        killers = self.killers[ply] if ply < len(self.killers) else []
+        if not history and not killers:
+            return moves
+        def key(move):
+            if move in killers:
+                return 0, killers.index(move)
+            return 1, -history.get(move, 0)
+        return sorted(moves, key = key)
+
+    def good_move(self, move, color, ply, depth):
+        """
+        Record move of color at ply, searched depth deep below it,
+        as a refutation or a best move
+        """
+        history = self.history[color]
+        history[move] = history.get(move, 0) + depth * depth + 1
+        self.add_killer(move, ply)
+
+    def add_killer(self, move, ply):
+        """ Make move the first killer move at ply """
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if move in killers:
+            killers.remove(move)
+        killers.insert(0, move)
+        del killers[KILLER_SLOTS:]
+
+    def memory(self):
+        """ Estimated bytes used by the history scores """
+        return sum(dict_memory(table) for table in self.history.values())
+
+class RecordMoveOrdering(MoveOrdering):
+    """
+    MoveOrdering with the history scores of both colors in one NumPy
+    array indexed by [color][point], large enough for every board size
+    """
+    def clear(self):
+        import numpy as np
+        maxpoint = MAXSIZE * MAXSIZE + 3 * (MAXSIZE + 1)
+        self.history = np.zeros((WHITE + 1, maxpoint), dtype = "i8")
+        self.killers = []
+
+    def age(self):
+        self.history >>= 1
+
+    def order(self, moves, color, ply):
+        killers = self.killers[ply] if ply < len(self.killers) else []
+        scores = self.history[color][moves].tolist()
+        def key(i):
+            move = moves[i]
+            if move in killers:
+                return 0, killers.index(move)
+            return 1, -scores[i]
+        return [moves[i] for i in sorted(range(len(moves)), key = key)]
+
+    def good_move(self, move, color, ply, depth):
+        self.history[color, move] += depth * depth + 1
+        self.add_killer(move, ply)
+
+    def memory(self):
+        return self.history.nbytes
@@ -0,0 +1,76 @@
+"""
+ponder.py
+Search on the opponent's time.
+
+After the engine has played a move, a background thread searches the
+positions after the opponent's most likely replies and stores the
+results in the shared SolveCache. When the opponent's move arrives,
+the search for it is often already done.
+"""
+
+import threading
+from board_util import GoBoardUtil
+
+class Ponderer(object):
+
+    def __init__(self, search, cache):
+        """
+        search: the root search function, called as
+            search(board, depth, color, stats, stop, time_limit)
+            -> (is_win, move)
+        cache: SolveCache that finished results are stored in
+        """
+        self.search = search
+        self.cache = cache
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, board, color, depth, time_limit):
+        """
+        Start pondering for color, with the opponent to play on board.
+        The board is copied, so the caller may keep changing it.
+        """
+        self.stop()
+        self._stop.clear()
+        self._thread = threading.Thread(target = self._run,
+            args = (board.copy(), color, depth, time_limit), daemon = True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Interrupt pondering and wait until the thread is done
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, board, color, depth, time_limit):
+        opponent = GoBoardUtil.opponent(color)
+        for reply in likely_replies(board, opponent):
+            if self._stop.is_set():
+                return
+            board.play_move_gomoku(reply, opponent)
+            if self.cache.lookup(board, color, depth) is None:
+                is_win, move = self.search(board.copy(), depth, color,
+                                           None, self._stop, time_limit)
+                # 4 means the search timed out, and an interrupted
+                # search only has a best-so-far result
+                if is_win != 4 and not self._stop.is_set():
+                    self.cache.store(board, color, depth, is_win, move)
+            board.undo_move_gomoku(reply, opponent)
+
+def likely_replies(board, color):
+    """
+    Empty points ordered by their heuristic value for color,
+    best first
+    """
+    scored = []
+    for point in board.get_empty_points():
+        previous = board.current_player
+        board.play_move_gomoku(point, color)
+        scored.append((board.point_check_gomoku_heuristic(point), point))
+        board.undo_move_gomoku(point, previous)
+    scored.sort(key = lambda item: -item[0])
+    return [point for _, point in scored]
@@ -0,0 +1,196 @@
+"""
+profiling.py
+Profilers that a GTP connection runs around the commands it executes.
+
+- FunctionProfiler records every call with cProfile. It is exact but
+  slows the search down several times.
+- SamplingProfiler looks at the stack of the profiled thread every
+  SAMPLE_INTERVAL seconds from a background thread, which costs little.
+- MemoryProfiler takes tracemalloc snapshots and compares each one
+  with the previous one.
+
+FunctionProfiler and SamplingProfiler only record between resume and
+pause, which the connection calls around each command, so the time
+spent waiting for the next command is left out. Only the thread that
+resumes a profiler is profiled, so searches run in worker processes
+are not seen.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+
+# number of functions or lines listed in a summary
+TOP_ENTRIES = 10
+SAMPLE_INTERVAL = 0.001
+# frames kept by tracemalloc for each allocation
+TRACE_FRAMES = 1
+
+def function_name(code):
+    """ Short name of a code object: file:line(function) """
+    return "{}:{}({})".format(os.path.basename(code.co_filename),
+                              code.co_firstlineno, code.co_name)
+
+class FunctionProfiler(object):
+    """
+    cProfile of the commands run while it is started
+    """
+    extension = ".prof"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        pass
+
+    def resume(self):
+        """ Profile the calling thread until pause """
+        self.profile.enable()
+
+    def pause(self):
+        self.profile.disable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, path):
+        """ Write the statistics to path, in the format of pstats """
+        self.profile.dump_stats(path)
+
+    def summary(self, limit = TOP_ENTRIES):
+        """ Lines of the limit functions with the most cumulative time """
+        out = io.StringIO()
+        stats = pstats.Stats(self.profile, stream = out)
+        stats.sort_stats("cumulative").print_stats(limit)
+        lines = out.getvalue().splitlines()
+        # drop the header lines before the table
+        for i, line in enumerate(lines):
+            if line.lstrip().startswith("ncalls"):
+                return [l for l in lines[i:] if l.strip()]
+        return [l for l in lines if l.strip()]
+
+class SamplingProfiler(object):
+    """
+    Statistical profiler of the commands run while it is started. A
+    background thread records the stack of the profiled thread at every
+    sample, while there is one.
+    """
+    extension = ".txt"
+
+    def __init__(self, interval = SAMPLE_INTERVAL):
+        self.interval = interval
+        # samples by stack, outermost function first
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = None
+        # ident of the profiled thread, None while paused
+        self.target = None
+
+    def start(self):
+        self.target = None
+        self.stopped.clear()
+        self.thread = threading.Thread(target = self._sample, daemon = True)
+        self.thread.start()
+
+    def resume(self):
+        """ Sample the calling thread until pause """
+        self.target = threading.get_ident()
+
+    def pause(self):
+        self.target = None
+
+    def _sample(self):
+        while not self.stopped.wait(self.interval):
+            target = self.target
+            if target is None:
+                continue
+            frame = sys._current_frames().get(target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(function_name(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[tuple(stack)] += 1
+            self.samples += 1
+
+    def stop(self):
+        self.target = None
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def dump(self, path):
+        """
+        Write the samples to path as collapsed stacks, one line per
+        stack: the functions separated by ; then the number of samples
+        """
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write("{} {}\n".format(';'.join(stack), count))
+
+    def summary(self, limit = TOP_ENTRIES):
+        """
+        Lines of the limit functions found in the most samples, with
+        their share of the samples at the top of the stack and anywhere
+        """
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for name in set(stack):
+                total[name] += count
+        samples = max(self.samples, 1)
+        lines = ["{} samples   self  total  function".format(self.samples)]
+        for name, count in total.most_common(limit):
+            lines.append("{:>16.1%} {:>6.1%}  {}".format(
+                own[name] / samples, count / samples, name))
+        return lines
+
+PROFILERS = {"cprofile": FunctionProfiler, "sample": SamplingProfiler}
+
+class MemoryProfiler(object):
+    """
+    tracemalloc snapshots, each compared with the one before
+    """
+    extension = ".snapshot"
+
+    def __init__(self):
+        self.snapshot = None
+
+    def start(self):
+        tracemalloc.start(TRACE_FRAMES)
+        self.snapshot = None
+
+    def stop(self):
+        tracemalloc.stop()
+        self.snapshot = None
+
+    def take(self, path = None, limit = TOP_ENTRIES):
+        """
+        Take a snapshot, write it to path if given, and return the lines
+        of the limit source lines that allocated the most memory, or
+        that grew the most since the previous snapshot
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)])
+        if path is not None:
+            snapshot.dump(path)
+        current, peak = tracemalloc.get_traced_memory()
+        lines = ["traced {:.1f} KiB, peak {:.1f} KiB".format(
+                 current / 1024, peak / 1024)]
+        if self.snapshot is None:
+            lines.extend(str(s) for s in snapshot.statistics("lineno")[:limit])
+        else:
+            lines.extend(str(s) for s in
+                         snapshot.compare_to(self.snapshot, "lineno")[:limit])
+        self.snapshot = snapshot
+        return lines
@@ -0,0 +1,277 @@
+"""
+search_cache.py
+Caches shared between the searches of a GTP connection.
+
+The evaluation cache and the transposition table come in two forms:
+bounded dicts, the default, and fixed-size NumPy record arrays sized
+from a memory budget by allocate_caches. A record costs a few dozen
+bytes where a dict entry with its key and value tuples costs hundreds.
+NumPy is only imported when the record arrays are allocated.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+from simple_board import EVALUATORS
+
+class SolveCache(object):
+    """
+    Bounded cache of root search results, keyed by position and
+    color to play. The least recently used entry is dropped when full.
+    The cache is shared with the ponder thread, so access is locked.
+    """
+    def __init__(self, capacity = 100000):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.probes = 0
+
+    @staticmethod
+    def key(board, color):
+        return (board.size, board.hash, color, board.evaluator)
+
+    def lookup(self, board, color, depth):
+        """
+        Return the (is_win, move) result stored for color to play on board,
+        searched at least depth deep, or None
+        """
+        key = self.key(board, color)
+        with self.lock:
+            self.probes += 1
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < depth:
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def store(self, board, color, depth, is_win, move):
+        key = self.key(board, color)
+        with self.lock:
+            self.entries[key] = (depth, is_win, move)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last = False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+class EvalCache(object):
+    """
+    Bounded cache of StatisticallyEvaluate results, keyed by position,
+    player to move, evaluator and whether there are moves left.
+    The least recently used entry is dropped when full.
+    Only the searching thread uses it, so access is not locked.
+    """
+    def __init__(self, capacity = 1 << 16):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.probes = 0
+
+    def evaluate(self, board, has_moves):
+        """ board.StatisticallyEvaluate(has_moves), from the cache if known """
+        key = (board.size, board.hash, board.current_player,
+               board.evaluator, has_moves)
+        self.probes += 1
+        result = self.entries.get(key)
+        if result is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+        result = board.StatisticallyEvaluate(has_moves)
+        self.entries[key] = result
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last = False)
+        return result
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def memory(self):
+        return dict_memory(self.entries)
+
+# kinds of scores stored in the transposition table
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+class TranspositionTable(object):
+    """
+    Bounded table of the scores found by the alpha-beta search, keyed by
+    position and color to play. Each entry holds the searched depth,
+    the score, whether the score is exact or a bound, and the best move.
+    The least recently used entry is dropped when full.
+    """
+    def __init__(self, capacity = 1 << 18):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+
+    def lookup(self, board, color):
+        """ The (depth, score, kind, move) entry for the position, or None """
+        key = (board.size, board.hash, color, board.evaluator)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def store(self, board, color, depth, score, kind, move):
+        key = (board.size, board.hash, color, board.evaluator)
+        self.entries[key] = (depth, score, kind, move)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last = False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def memory(self):
+        return dict_memory(self.entries)
+
+def object_memory(value):
+    """
+    Estimated bytes of value not shared with the rest of the program:
+    tuples with their items, and ints outside the small int cache.
+    None, bools and strings, the names of evaluators, are shared.
+    """
+    if type(value) is tuple:
+        return sys.getsizeof(value) + sum(object_memory(v) for v in value)
+    if value is None or type(value) in (bool, str):
+        return 0
+    if type(value) is int and -5 <= value <= 256:
+        return 0
+    return sys.getsizeof(value)
+
+def dict_memory(entries):
+    """
+    Estimated bytes used by a dict and its keys and values. The size of
+    an OrderedDict includes the nodes of its order.
+    """
+    size = sys.getsizeof(entries)
+    for key, value in entries.items():
+        size += object_memory(key) + object_memory(value)
+    return size
+
+def record_slot(board, color, capacity):
+    """ Slot of the position in a record array of capacity slots """
+    return (board.hash ^ (color * 0x9E3779B97F4A7C15) ^ board.size) \
+           % capacity
+
+# layouts of the records; key, size, color and evaluator identify the
+# position, and used marks the filled slots
+EVAL_RECORD = [("key", "u8"), ("size", "u1"), ("player", "u1"),
+               ("evaluator", "u1"), ("has_moves", "?"), ("used", "?"),
+               ("win", "?"), ("winner", "u1"), ("points", "i8")]
+TT_RECORD = [("key", "u8"), ("size", "u1"), ("color", "u1"),
+             ("evaluator", "u1"), ("used", "?"), ("depth", "i2"),
+             ("kind", "u1"), ("move", "i4"), ("score", "i8")]
+
+class RecordEvalCache(object):
+    """
+    EvalCache in a preallocated NumPy record array of capacity slots.
+    A position goes to the slot given by its hash and replaces whatever
+    was there.
+    """
+    def __init__(self, capacity):
+        import numpy as np
+        self.capacity = capacity
+        self.records = np.zeros(capacity, dtype = EVAL_RECORD)
+        self.hits = 0
+        self.probes = 0
+
+    def evaluate(self, board, has_moves):
+        """ board.StatisticallyEvaluate(has_moves), from the cache if known """
+        player = board.current_player
+        evaluator = EVALUATORS.index(board.evaluator)
+        slot = record_slot(board, player, self.capacity)
+        self.probes += 1
+        key, size, rplayer, revaluator, rhas_moves, used, win, winner, \
+            points = self.records[slot].item()
+        if used and key == board.hash and size == board.size and \
+           rplayer == player and revaluator == evaluator and \
+           rhas_moves == has_moves:
+            self.hits += 1
+            return win, (winner or None), points
+        result = board.StatisticallyEvaluate(has_moves)
+        win, winner, points = result
+        self.records[slot] = (board.hash, board.size, player, evaluator,
+                              has_moves, True, win, winner or 0, points)
+        return result
+
+    def clear(self):
+        self.records.fill(0)
+
+    def __len__(self):
+        return int(self.records["used"].sum())
+
+    def memory(self):
+        return self.records.nbytes
+
+class RecordTranspositionTable(object):
+    """
+    TranspositionTable in a preallocated NumPy record array of capacity
+    slots. A position goes to the slot given by its
+    hash and replaces whatever was there.
+    """
+    def __init__(self, capacity):
+        import numpy as np
+        self.capacity = capacity
+        self.records = np.zeros(capacity, dtype = TT_RECORD)
+
+    def lookup(self, board, color):
+        """ The (depth, score, kind, move) entry for the position, or None """
+        key, size, rcolor, evaluator, used, depth, kind, move, score = \
+            self.records[record_slot(board, color, self.capacity)].item()
+        if used and key == board.hash and size == board.size and \
+           rcolor == color and evaluator == EVALUATORS.index(board.evaluator):
+            return depth, score, kind, (move if move >= 0 else None)
+        return None
+
+    def store(self, board, color, depth, score, kind, move):
+        self.records[record_slot(board, color, self.capacity)] = (
+            board.hash, board.size, color, EVALUATORS.index(board.evaluator),
+            True, depth, kind, move if move is not None else -1, score)
+
+    def clear(self):
+        self.records.fill(0)
+
+    def __len__(self):
+        return int(self.records["used"].sum())
+
+    def memory(self):
+        return self.records.nbytes
+
+# shares of a memory budget left after the history tables
+TT_SHARE = 2 / 3
+
+def allocate_caches(megabytes):
+    """
+    Record array caches sized from a budget of megabytes for all of
+    them. Returns (move_ordering, eval_cache, transposition_table).
+    """
+    import numpy as np
+    from move_ordering import RecordMoveOrdering
+    budget = int(megabytes * (1 << 20))
+    ordering = RecordMoveOrdering()
+    budget -= ordering.memory()
+    if budget <= 0:
+        raise ValueError("{} MB is less than the history tables need"
+                         .format(megabytes))
+    tt_budget = int(budget * TT_SHARE)
+    tt = RecordTranspositionTable(
+        max(1, tt_budget // np.dtype(TT_RECORD).itemsize))
+    eval_cache = RecordEvalCache(
+        max(1, (budget - tt_budget) // np.dtype(EVAL_RECORD).itemsize))
+    return ordering, eval_cache, tt
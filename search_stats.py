@@ -0,0 +1,153 @@
+"""
+search_stats.py
+Counters collected by the solver while it searches.
+
+Collecting statistics is optional. The solver only touches a
+SearchStats object when one is passed in, so searches without one
+pay nothing for it.
+"""
+
+import time
+
+class SearchStats(object):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all counters, ready for a new search
+        """
+        self.nodes = 0
+        self.leaves = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.cutoffs = 0
+        self.max_depth = 0
+        self.start_time = time.time()
+        self.elapsed = 0.0
+        # nodes_at_ply[d] is the number of nodes visited d moves below root
+        self.nodes_at_ply = []
+        # one (depth, nodes, seconds) record per finished iteration
+        self.iterations = []
+        self._iteration_nodes = 0
+        self._iteration_start = self.start_time
+        # whether the last answer came from a cache, without a search
+        self.cached = False
+
+    def start(self):
+        self.reset()
+
+    def stop(self):
+        self.elapsed = time.time() - self.start_time
+
+    def update_from(self, other):
+        """
+        Take the counters of other, the stats of a search run elsewhere
+        such as in a worker process
+        """
+        self.nodes = other.nodes
+        self.leaves = other.leaves
+        self.tt_probes = other.tt_probes
+        self.tt_hits = other.tt_hits
+        self.cutoffs = other.cutoffs
+        self.max_depth = other.max_depth
+        self.start_time = other.start_time
+        self.elapsed = other.elapsed
+        self.nodes_at_ply = list(other.nodes_at_ply)
+        self.iterations = list(other.iterations)
+        self._iteration_nodes = other._iteration_nodes
+        self._iteration_start = other._iteration_start
+        self.cached = other.cached
+
+    def node(self, ply):
+        """
+        Count a node visited ply moves below the root
+        """
+        self.nodes += 1
+        if ply > self.max_depth:
+            self.max_depth = ply
+        if ply < len(self.nodes_at_ply):
+            self.nodes_at_ply[ply] += 1
+        else:
+            while len(self.nodes_at_ply) < ply:
+                self.nodes_at_ply.append(0)
+            self.nodes_at_ply.append(1)
+
+    def leaf(self):
+        """ Count a call to the static evaluation """
+        self.leaves += 1
+
+    def cutoff(self):
+        self.cutoffs += 1
+
+    def tt_probe(self, hit):
+        """ Count a transposition table lookup, and whether it was found """
+        self.tt_probes += 1
+        if hit:
+            self.tt_hits += 1
+
+    def iteration_done(self, depth):
+        """
+        Record the work of a search iteration to the given depth
+        """
+        now = time.time()
+        self.iterations.append((depth, self.nodes - self._iteration_nodes,
+                                now - self._iteration_start))
+        self._iteration_nodes = self.nodes
+        self._iteration_start = now
+
+    def nps(self):
+        """ Nodes per second of the last search """
+        if self.elapsed <= 0:
+            return 0
+        return int(self.nodes / self.elapsed)
+
+    def branching_factors(self):
+        """
+        Average number of children searched per node, for each ply
+        """
+        factors = []
+        for ply in range(len(self.nodes_at_ply) - 1):
+            parents = self.nodes_at_ply[ply]
+            children = self.nodes_at_ply[ply + 1]
+            factors.append(children / parents if parents else 0.0)
+        return factors
+
+    def hit_rate(self, hits, probes):
+        if probes == 0:
+            return 0.0
+        return hits / probes
+
+    def report(self):
+        """
+        Multi-line report of the last search, used by the
+        search_stats GTP command
+        """
+        lines = ["cached {}".format("yes" if self.cached else "no"),
+                 "nodes {}".format(self.nodes),
+                 "leaves {}".format(self.leaves),
+                 "nps {}".format(self.nps()),
+                 "max_depth {}".format(self.max_depth),
+                 "cutoffs {}".format(self.cutoffs),
+                 "time {:.3f}".format(self.elapsed),
+                 "tt_hits {}/{} ({:.1%})".format(self.tt_hits,
+                     self.tt_probes, self.hit_rate(self.tt_hits,
+                                                   self.tt_probes))]
+        factors = self.branching_factors()
+        for ply, count in enumerate(self.nodes_at_ply):
+            if ply < len(factors):
+                lines.append("ply {} nodes {} branching {:.2f}".format(
+                             ply, count, factors[ply]))
+            else:
+                lines.append("ply {} nodes {}".format(ply, count))
+        for i, (depth, nodes, seconds) in enumerate(self.iterations):
+            lines.append("iteration {} depth {} nodes {} time {:.3f}".format(
+                         i + 1, depth, nodes, seconds))
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return "nodes {} leaves {} nps {} depth {} tt_hits {} " \
+               "cutoffs {} time {:.3f}".format(self.nodes, self.leaves,
+                   self.nps(), self.max_depth, self.tt_hits, self.cutoffs,
+                   self.elapsed)
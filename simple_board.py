@@ -6,13 +6,52 @@ Implements a basic Go board with functions to:
 - check if a move is legal
 - play a move
 
-The board uses a 1-dimensional representation with padding
+The board uses a 1-dimensional representation with padding,
+stored in a plain Python list so that playing does not need NumPy
 """
 
-import numpy as np
+import random
 from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, BORDER, \
-                       PASS, is_black_white, coord_to_point, where1d, \
+                       PASS, is_black_white, coord_to_point, \
                        MAXSIZE, NULLPOINT
+from line_patterns import PATTERNS, LIVE_SPANS, window_table, \
+                          pattern_score, fives, fours, open_fours, \
+                          live_spans, score_arrays, incidence_arrays
+
+# Zobrist keys for each board array length, shared by all boards of a size
+_zobrist_tables = {}
+
+def zobrist_table(maxpoint):
+    """
+    Random 64 bit keys indexed by [color][point], used to hash positions.
+    The keys for EMPTY are all 0.
+    """
+    if maxpoint not in _zobrist_tables:
+        rng = random.Random(maxpoint)
+        table = [[0] * maxpoint]
+        for color in [BLACK, WHITE]:
+            table.append([rng.getrandbits(64) for _ in range(maxpoint)])
+        _zobrist_tables[maxpoint] = table
+    return _zobrist_tables[maxpoint]
+
+# names of the heuristics StatisticallyEvaluate can use: heuristic_solve,
+# or pattern_solve with the line pattern scores
+HEURISTIC = "heuristic"
+PATTERN = "pattern"
+EVALUATORS = [HEURISTIC, PATTERN]
+
+# on-board points and neighbor lists for each board size, shared by
+# all boards of that size, so that reset and copy do not rebuild them
+_board_points = {}
+_neighbor_tables = {}
+
+def board_points(size):
+    """ List of the points on a board of given size, in array order """
+    if size not in _board_points:
+        NS = size + 1
+        _board_points[size] = [row * NS + col for row in range(1, size + 1)
+                               for col in range(1, size + 1)]
+    return _board_points[size]
 
 class SimpleGoBoard(object):
 
@@ -61,13 +100,16 @@ class SimpleGoBoard(object):
         Return:
             The empty points on the board
         """
-        return where1d(self.board == EMPTY)
+        board = self.board
+        return [point for point in self.points if board[point] == EMPTY]
 
     def __init__(self, size):
         """
         Creates a Go board of given size
         """
         assert 2 <= size <= MAXSIZE
+        # heuristic used by StatisticallyEvaluate, one of EVALUATORS
+        self.evaluator = HEURISTIC
         self.reset(size)
 
     def reset(self, size):
@@ -82,19 +124,43 @@ class SimpleGoBoard(object):
         self.ko_recapture = None
         self.current_player = BLACK
         self.maxpoint = size * size + 3 * (size + 1)
-        self.board = np.full(self.maxpoint, BORDER, dtype = np.int32)
-        self.liberty_of = np.full(self.maxpoint, NULLPOINT, dtype = np.int32)
+        self.points = board_points(size)
+        self.board = [BORDER] * self.maxpoint
+        self.liberty_of = [NULLPOINT] * self.maxpoint
+        # Zobrist hash of the stones on the board, 0 for the empty board
+        self.zobrist = zobrist_table(self.maxpoint)
+        self.hash = 0
+        # codes of the line pattern windows and the sum of their packed
+        # scores and threats, see line_patterns.py
+        codes, self.point_windows, self.patterns, self.span_points = \
+            window_table(size, self.maxpoint)
+        self.window_codes = codes[:]
         self._initialize_empty_points(self.board)
         self._initialize_neighbors()
 
     def copy(self):
-        b = SimpleGoBoard(self.size)
-        assert b.NS == self.NS
-        assert b.WE == self.WE
+        """
+        Copy of the board. The tables shared by all boards of the size
+        are shared with the copy, not rebuilt.
+        """
+        b = SimpleGoBoard.__new__(SimpleGoBoard)
+        b.size = self.size
+        b.NS = self.NS
+        b.WE = self.WE
         b.ko_recapture = self.ko_recapture
         b.current_player = self.current_player
-        assert b.maxpoint == self.maxpoint
-        b.board = np.copy(self.board)
+        b.maxpoint = self.maxpoint
+        b.points = self.points
+        b.board = self.board[:]
+        b.liberty_of = self.liberty_of[:]
+        b.zobrist = self.zobrist
+        b.hash = self.hash
+        b.evaluator = self.evaluator
+        b.point_windows = self.point_windows
+        b.span_points = self.span_points
+        b.window_codes = self.window_codes[:]
+        b.patterns = self.patterns
+        b.neighbors = self.neighbors
         return b
 
     def row_start(self, row):
@@ -107,11 +173,10 @@ class SimpleGoBoard(object):
         Fills points on the board with EMPTY
         Argument
         ---------
-        board: numpy array, filled with BORDER
+        board: list, filled with BORDER
         """
-        for row in range(1, self.size + 1):
-            start = self.row_start(row)
-            board[start : start + self.size] = EMPTY
+        for point in self.points:
+            board[point] = EMPTY
 
     def _on_board_neighbors(self, point):
         nbs = []
@@ -123,14 +188,18 @@ class SimpleGoBoard(object):
     def _initialize_neighbors(self):
         """
         precompute neighbor array.
-        For each point on the board, store its list of on-the-board neighbors
-        """
-        self.neighbors = []
-        for point in range(self.maxpoint):
-            if self.board[point] == BORDER:
-                self.neighbors.append([])
-            else:
-                self.neighbors.append(self._on_board_neighbors(point))
+        For each point on the board, store its list of on-the-board neighbors.
+        The array is computed once per board size.
+        """
+        if self.size not in _neighbor_tables:
+            neighbors = []
+            for point in range(self.maxpoint):
+                if self.board[point] == BORDER:
+                    neighbors.append([])
+                else:
+                    neighbors.append(self._on_board_neighbors(point))
+            _neighbor_tables[self.size] = neighbors
+        self.neighbors = _neighbor_tables[self.size]
         
     def is_eye(self, point, color):
         """
@@ -167,9 +236,9 @@ class SimpleGoBoard(object):
         """
         Find any liberty of the given block.
         Returns None in case there is no liberty.
-        block is a numpy boolean array
+        block is a list of stones
         """
-        for stone in where1d(block):
+        for stone in block:
             lib = self.find_neighbor_of_color(stone, EMPTY)
             if lib != None:
                 return lib
@@ -179,12 +248,12 @@ class SimpleGoBoard(object):
         """
         Check if the given block has any liberty.
         Also updates the liberty_of array.
-        block is a numpy boolean array
+        block is a list of stones
         """
         lib = self._get_liberty(block)
         if lib != None:
             assert self.get_color(lib) == EMPTY
-            for stone in where1d(block):
+            for stone in block:
                 self.liberty_of[stone] = lib
             return True
         return False
@@ -192,22 +261,22 @@ class SimpleGoBoard(object):
     def _block_of(self, stone):
         """
         Find the block of given stone
-        Returns a board of boolean markers which are set for
-        all the points in the block 
+        Returns the list of all the points in the block
         """
-        marker = np.full(self.maxpoint, False, dtype = bool)
+        block = [stone]
         pointstack = [stone]
         color = self.get_color(stone)
         assert is_black_white(color)
-        marker[stone] = True
+        marker = {stone}
         while pointstack:
             p = pointstack.pop()
             neighbors = self.neighbors_of_color(p, color)
             for nb in neighbors:
-                if not marker[nb]:
-                    marker[nb] = True
+                if nb not in marker:
+                    marker.add(nb)
+                    block.append(nb)
                     pointstack.append(nb)
-        return marker
+        return block
 
     def _fast_liberty_check(self, nb_point):
         lib = self.liberty_of[nb_point]
@@ -240,9 +309,13 @@ class SimpleGoBoard(object):
         opp_block = self._block_of(nb_point)
         if self._has_liberty(opp_block):
             return None
-        captures = list(where1d(opp_block))
-        self.board[captures] = EMPTY
-        self.liberty_of[captures] = NULLPOINT
+        captures = opp_block
+        keys = self.zobrist[self.board[nb_point]]
+        for stone in captures:
+            self.hash ^= keys[stone]
+            self._update_patterns(stone, -self.board[stone])
+            self.board[stone] = EMPTY
+            self.liberty_of[stone] = NULLPOINT
         single_capture = None 
         if len(captures) == 1:
             single_capture = nb_point
@@ -281,6 +354,8 @@ class SimpleGoBoard(object):
             if not self._has_liberty(block): # undo suicide move
                 self.board[point] = EMPTY
                 return False
+        self.hash ^= self.zobrist[color][point]
+        self._update_patterns(point, color)
         self.ko_recapture = None
         if in_enemy_eye and len(single_captures) == 1:
             self.ko_recapture = single_captures[0]
@@ -347,8 +422,35 @@ class SimpleGoBoard(object):
         if self.board[point] != EMPTY:
             return False
         self.board[point] = color
+        self.hash ^= self.zobrist[color][point]
+        self._update_patterns(point, color)
         self.current_player = GoBoardUtil.opponent(color)
         return True
+
+    def undo_move_gomoku(self, point, color):
+        """
+            Take back the stone on point, for the game of gomoku.
+            color is the player that was to move before the stone was played.
+            """
+        assert self.board[point] != EMPTY
+        self.hash ^= self.zobrist[self.board[point]][point]
+        self._update_patterns(point, -self.board[point])
+        self.board[point] = EMPTY
+        self.current_player = color
+
+    def _update_patterns(self, point, change):
+        """
+        Update the line pattern windows through point for a change of
+        its color by change, and the packed pattern sum
+        """
+        codes = self.window_codes
+        patterns = self.patterns
+        for window, weight in self.point_windows[point]:
+            old = codes[window]
+            new = old + change * weight
+            codes[window] = new
+            patterns += PATTERNS[new] - PATTERNS[old]
+        self.patterns = patterns
         
     def _point_direction_check_connect_gomoko(self, point, shift):
         """
@@ -458,8 +560,9 @@ class SimpleGoBoard(object):
         """
             Check if the game ends for the game of Gomoku.
             """
-        white_points = where1d(self.board == WHITE)
-        black_points = where1d(self.board == BLACK)
+        board = self.board
+        white_points = [p for p in self.points if board[p] == WHITE]
+        black_points = [p for p in self.points if board[p] == BLACK]
         
         for point in white_points:
             if self.point_check_game_end_gomoku(point):
@@ -476,8 +579,9 @@ class SimpleGoBoard(object):
         Uses heuristic to see which color is more likely to win,
         or a draw if neither side is more likely
         """
-        white_points = where1d(self.board == WHITE)
-        black_points = where1d(self.board == BLACK)
+        board = self.board
+        white_points = [p for p in self.points if board[p] == WHITE]
+        black_points = [p for p in self.points if board[p] == BLACK]
         white_count = 0
         black_count = 0
 
@@ -498,12 +602,93 @@ class SimpleGoBoard(object):
             return False, None, 0
 
 
+    def pattern_game_end(self):
+        """
+        Same result as check_game_end_gomoku, from the fives counted
+        by the line pattern windows
+        """
+        if fives(self.patterns, WHITE) > 0:
+            return True, WHITE
+        if fives(self.patterns, BLACK) > 0:
+            return True, BLACK
+        return False, None
+
+    def is_dead_draw(self):
+        """
+        Whether neither color can make five any more: every five points
+        in a row hold stones of both colors
+        """
+        return live_spans(self.patterns, BLACK) == 0 and \
+               live_spans(self.patterns, WHITE) == 0
+
+    def live_points(self):
+        """
+        Set of the points in a live span of either color.
+        Other points cannot be part of a five any more.
+        """
+        live = set()
+        codes = self.window_codes
+        for window, points in enumerate(self.span_points):
+            if LIVE_SPANS[codes[window]]:
+                live.update(points)
+        return live
+
+    def score_moves(self, color):
+        """
+        One-ply value of a stone of color on every empty point, computed
+        for all points at once with NumPy from the line pattern windows:
+        the gain of the pattern score of color (attack) plus the loss of
+        the pattern score of the other color (defense).
+        Returns an array aligned with get_empty_points.
+        """
+        import numpy as np
+        rows, windows, weights = incidence_arrays(self.size, self.maxpoint,
+                                                  self.points)
+        empty = np.array([self.board[point] == EMPTY
+                          for point in self.points])
+        keep = empty[rows]
+        # index of every kept pair's point among the empty points
+        rows = (np.cumsum(empty) - 1)[rows[keep]]
+        codes = np.array(self.window_codes, dtype = np.int64)[windows[keep]]
+        weights = weights[keep]
+        scores = score_arrays()
+        other = GoBoardUtil.opponent(color)
+        played = codes + color * weights
+        values = scores[color][played] - scores[color][codes] + \
+                 scores[other][codes] - scores[other][played]
+        return np.bincount(rows, weights = values,
+                           minlength = int(empty.sum())).astype(np.int64)
+
+    def pattern_solve(self):
+        """
+        Like heuristic_solve, but scores the line patterns of the two
+        colors. A player to move with a four completes it, and an open
+        four of the other player cannot be stopped; both count as wins.
+        """
+        to_play = self.current_player
+        other = GoBoardUtil.opponent(to_play)
+        if fours(self.patterns, to_play) > 0:
+            return True, to_play, 10000
+        if open_fours(self.patterns, other) > 0:
+            return True, other, 10000
+        white_count = pattern_score(self.patterns, WHITE)
+        black_count = pattern_score(self.patterns, BLACK)
+        if white_count > black_count:
+            return True, WHITE, white_count
+        elif black_count > white_count:
+            return True, BLACK, black_count
+        else:
+            return False, None, 0
+
     def StatisticallyEvaluate(self, has_moves=True):
         points = 10000
-        win_status, win_color = self.check_game_end_gomoku()
+        win_status, win_color = self.pattern_game_end()
 
         if not win_status and has_moves:
-            win_status, win_color, points = self.heuristic_solve()
+            if self.evaluator == PATTERN:
+                win_status, win_color, points = self.pattern_solve()
+            else:
+                win_status, win_color, points = self.heuristic_solve()
         elif not win_status and not has_moves:
             win_status = False
             win_color = None
@@ -0,0 +1,312 @@
+#!/usr/bin/python3
+"""
+tablebase.py
+Exhaustive Gomoku tablebases for small boards.
+
+Every position with black moving first, from the empty board to the
+full board, is solved by backward induction one layer at a time: the
+positions with n stones are solved from the already solved positions
+with n + 1 stones. The positions of a layer are independent, so each
+layer is split into chunks solved in parallel worker processes.
+
+A tablebase file holds a HEADER_SIZE byte header and then one value
+byte per position, for the player to move: DRAW, WIN or LOSS.
+Positions are numbered by a perfect index, layer by layer. Within the
+layer of n stones, of which n // 2 are white, a position is numbered
+by the colex rank of its set of occupied points among all n-point sets,
+then by the colex rank of the white stones among the occupied points.
+Points are numbered row by row from A1.
+
+Boards smaller than 5x5 cannot hold five in a row, so all their
+positions are draws. 5x5 has about 1.6e11 positions, too many to
+generate here. As no table that can be built holds anything but
+draws, the GTP engine does not read tablebases.
+
+Usage:
+    python3 tablebase.py --size 4 [--workers N] [--directory tablebases]
+"""
+
+import argparse
+import mmap
+import os
+import sys
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from math import comb
+
+from board_util import BLACK, WHITE, EMPTY
+
+MAGIC = b"GMKTB1"
+HEADER_SIZE = 16
+# values of a position for the player to move
+DRAW = 0
+WIN = 1
+LOSS = 2
+# occupied point sets solved by one worker task
+CHUNK = 4096
+# directory the GTP engine loads tablebases from
+TABLEBASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "tablebases")
+
+def tablebase_path(directory, size):
+    return os.path.join(directory, "gomoku{}.tb".format(size))
+
+def layer_offsets(points):
+    """
+    File offset of the first position of each layer, and the file size
+    """
+    offsets = []
+    offset = HEADER_SIZE
+    for n in range(points + 1):
+        offsets.append(offset)
+        offset += comb(points, n) * comb(n, n // 2)
+    return offsets, offset
+
+def five_masks(size):
+    """ Bit masks of the points of every five in a row """
+    masks = []
+    for drow, dcol in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+        for row in range(size):
+            for col in range(size):
+                cells = [(row + i * drow, col + i * dcol) for i in range(5)]
+                if all(0 <= r < size and 0 <= c < size for r, c in cells):
+                    mask = 0
+                    for r, c in cells:
+                        mask |= 1 << (r * size + c)
+                    masks.append(mask)
+    return masks
+
+def has_five(stones, masks):
+    """ Whether the bit mask stones holds one of the masks """
+    for mask in masks:
+        if stones & mask == mask:
+            return True
+    return False
+
+def colex_rank(elements):
+    """ Colex rank of a sorted list of distinct non-negative integers """
+    return sum(comb(c, i + 1) for i, c in enumerate(elements))
+
+def colex_unrank(rank, k):
+    """ The sorted list of k integers of given colex rank """
+    elements = []
+    for i in range(k, 0, -1):
+        c = i - 1
+        while comb(c + 1, i) <= rank:
+            c += 1
+        elements.append(c)
+        rank -= comb(c, i)
+    elements.reverse()
+    return elements
+
+def position_index(occupied, white_indices, offsets):
+    """
+    Index of a position given its sorted occupied points and the
+    sorted indices of its white stones in occupied
+    """
+    n = len(occupied)
+    return offsets[n] + colex_rank(occupied) * comb(n, n // 2) + \
+           colex_rank(white_indices)
+
+def solve_chunk(path, size, n, first, last):
+    """
+    Solve the positions of layer n whose occupied point sets have colex
+    ranks first to last - 1, and write their values to the file at path.
+    Runs in a worker process. Returns the counts of wins, draws, losses.
+    """
+    points = size * size
+    masks = five_masks(size)
+    offsets, _ = layer_offsets(points)
+    whites = n // 2
+    white_sets = comb(n, whites)
+    # the player to move adds a stone; black moves when the counts are equal
+    white_to_move = n % 2 == 1
+    child_whites = (n + 1) // 2
+    child_white_sets = comb(n + 1, child_whites)
+    counts = [0, 0, 0]
+    values = bytearray((last - first) * white_sets)
+    with open(path, "r+b") as f:
+        data = mmap.mmap(f.fileno(), 0)
+        for occ_rank in range(first, last):
+            occupied = colex_unrank(occ_rank, n)
+            occupied_set = set(occupied)
+            empty = [p for p in range(points) if p not in occupied_set]
+            # colex rank of occupied plus a point with j smaller points is
+            # low[j] + comb(point, j + 1) + high[j]
+            low = [0]
+            for i, c in enumerate(occupied):
+                low.append(low[-1] + comb(c, i + 1))
+            high = [0] * (n + 1)
+            for i in range(n - 1, -1, -1):
+                high[i] = high[i + 1] + comb(occupied[i], i + 2)
+            children = []
+            for p in empty:
+                j = bisect_left(occupied, p)
+                children.append((p, j, low[j] + comb(p, j + 1) + high[j]))
+            for white_rank in range(white_sets):
+                white_indices = colex_unrank(white_rank, whites)
+                white_mask = 0
+                for i in white_indices:
+                    white_mask |= 1 << occupied[i]
+                black_mask = 0
+                for c in occupied:
+                    black_mask |= 1 << c
+                black_mask &= ~white_mask
+                if white_to_move:
+                    mover_five = has_five(white_mask, masks)
+                    other_five = has_five(black_mask, masks)
+                else:
+                    mover_five = has_five(black_mask, masks)
+                    other_five = has_five(white_mask, masks)
+                if other_five:
+                    value = LOSS
+                elif mover_five:
+                    value = WIN
+                elif n == points:
+                    value = DRAW
+                else:
+                    # white rank after a stone is added among the occupied
+                    # points at index j: white indices from j on move up one
+                    wlow = [0]
+                    for i, c in enumerate(white_indices):
+                        wlow.append(wlow[-1] + comb(c, i + 1))
+                    shift = 2 if white_to_move else 1
+                    whigh = [0] * (whites + 1)
+                    for i in range(whites - 1, -1, -1):
+                        whigh[i] = whigh[i + 1] + \
+                                   comb(white_indices[i] + 1, i + shift)
+                    value = LOSS
+                    for p, j, child_occ_rank in children:
+                        t = bisect_left(white_indices, j)
+                        child_white_rank = wlow[t] + whigh[t]
+                        if white_to_move:
+                            child_white_rank += comb(j, t + 1)
+                        child = data[offsets[n + 1] + child_occ_rank *
+                                     child_white_sets + child_white_rank]
+                        if child == LOSS:
+                            value = WIN
+                            break
+                        if child == DRAW:
+                            value = DRAW
+                values[(occ_rank - first) * white_sets + white_rank] = value
+                counts[value] += 1
+        start = offsets[n] + first * white_sets
+        data[start : start + len(values)] = values
+        data.close()
+    return counts[WIN], counts[DRAW], counts[LOSS]
+
+def generate(size, directory, workers = None, out = sys.stdout):
+    """
+    Generate the tablebase of a board size into directory.
+    Returns the path of the file.
+    """
+    points = size * size
+    offsets, file_size = layer_offsets(points)
+    os.makedirs(directory, exist_ok = True)
+    path = tablebase_path(directory, size)
+    with open(path, "wb") as f:
+        f.write(MAGIC + bytes([size]) + bytes(HEADER_SIZE - len(MAGIC) - 1))
+        f.truncate(file_size)
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        for n in range(points, -1, -1):
+            start = time.time()
+            occupied_sets = comb(points, n)
+            futures = [executor.submit(solve_chunk, path, size, n, first,
+                                       min(first + CHUNK, occupied_sets))
+                       for first in range(0, occupied_sets, CHUNK)]
+            totals = [0, 0, 0]
+            for future in futures:
+                for i, count in enumerate(future.result()):
+                    totals[i] += count
+            out.write("layer {:3d}: {} positions, +{} ={} -{}, {:.1f}s\n"
+                      .format(n, sum(totals), totals[0], totals[1],
+                              totals[2], time.time() - start))
+            out.flush()
+    return path
+
+class Tablebase(object):
+    """
+    Read-only tablebase of one board size, mapped into memory
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError("{} is not a tablebase".format(path))
+        self.size = self.data[len(MAGIC)]
+        self.offsets, _ = layer_offsets(self.size * self.size)
+
+    def value(self, board, color):
+        """
+        Value of board for color to play, or None if the position is
+        not in the table: color is not the player who moves next when
+        black starts and the players alternate
+        """
+        if board.size != self.size:
+            return None
+        occupied = []
+        white_indices = []
+        for i, point in enumerate(board.points):
+            stone = board.board[point]
+            if stone != EMPTY:
+                if stone == WHITE:
+                    white_indices.append(len(occupied))
+                occupied.append(i)
+        n = len(occupied)
+        if len(white_indices) != n // 2:
+            return None
+        if color != (WHITE if n % 2 == 1 else BLACK):
+            return None
+        return self.data[position_index(occupied, white_indices,
+                                        self.offsets)]
+
+    def solve(self, board, color):
+        """
+        Solve board for color to play by lookup.
+        Returns (is_win, move) with the codes of Minimax: 2 and a winning
+        move, 1 and a drawing move, or 0; or None if the position is
+        not in the table or the game is over.
+        """
+        value = self.value(board, color)
+        moves = board.get_empty_points()
+        if value is None or len(moves) == 0 or \
+           board.check_game_end_gomoku()[0]:
+            return None
+        if value == LOSS:
+            return 0, None
+        wanted = LOSS if value == WIN else DRAW
+        opponent = WHITE + BLACK - color
+        for move in moves:
+            board.play_move_gomoku(move, color)
+            child = self.value(board, opponent)
+            board.undo_move_gomoku(move, color)
+            if child == wanted:
+                return (2 if value == WIN else 1), move
+        return None
+
+    def close(self):
+        self.data.close()
+
+def open_tablebase(size, directory = TABLEBASE_DIR):
+    """ The Tablebase of a board size in directory, or None if missing """
+    path = tablebase_path(directory, size)
+    if not os.path.exists(path):
+        return None
+    return Tablebase(path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate the Gomoku tablebase of a small board")
+    parser.add_argument("--size", type=int, required=True)
+    parser.add_argument("--workers", type=int,
+                        help="worker processes, by default one per CPU")
+    parser.add_argument("--directory", default=TABLEBASE_DIR,
+                        help="where to write gomokuSIZE.tb")
+    args = parser.parse_args(argv)
+    start = time.time()
+    path = generate(args.size, args.directory, args.workers)
+    print("wrote {} in {:.1f}s".format(path, time.time() - start))
+
+if __name__ == '__main__':
+    main()
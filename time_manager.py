@@ -0,0 +1,105 @@
+"""
+time_manager.py
+Game clock of the GTP time_settings and time_left commands, and the
+time allocated to each move.
+
+The clock of each color is its main time, then byo-yomi periods of
+byo_yomi_time seconds for byo_yomi_stones moves. A move gets:
+- in main time, the remaining time shared among the moves still to
+  play, about half the empty points, plus a share of a byo-yomi period
+- in byo-yomi, the period time shared among the stones left in it
+- CRITICAL_FACTOR times as much when a four is on the board, as the
+  reply decides the game
+and never more than the remaining time less SAFETY_MARGIN.
+"""
+
+from board_util import BLACK, WHITE
+from line_patterns import fours
+
+# seconds kept in reserve for the GTP round trip and the end of the search
+SAFETY_MARGIN = 0.5
+# shortest time a move is given
+MIN_BUDGET = 0.05
+# fewest moves the remaining main time is shared among
+MIN_MOVES_TO_GO = 5
+CRITICAL_FACTOR = 2.0
+
+class TimeManager(object):
+
+    def __init__(self):
+        self.set_time(None, 0, 0)
+
+    def set_time(self, main_time, byo_yomi_time, byo_yomi_stones):
+        """
+        Time settings of the game: main_time None, or byo-yomi time
+        without byo-yomi stones, means no time limit
+        """
+        self.main_time = main_time
+        self.byo_yomi_time = byo_yomi_time
+        self.byo_yomi_stones = byo_yomi_stones
+        self.reset()
+
+    def reset(self):
+        """ Full clocks, for a new game """
+        # remaining seconds and byo-yomi stones by color; 0 stones while
+        # in main time
+        self.time_left = {BLACK: self.main_time, WHITE: self.main_time}
+        self.stones_left = {BLACK: 0, WHITE: 0}
+
+    def limited(self):
+        return self.main_time is not None and \
+               not (self.byo_yomi_time > 0 and self.byo_yomi_stones == 0)
+
+    def set_time_left(self, color, seconds, stones):
+        """ Clock of color as reported by the controller """
+        self.time_left[color] = seconds
+        self.stones_left[color] = stones
+
+    def critical(self, board):
+        """ Whether a player has a four, so the next move is forced """
+        return fours(board.patterns, BLACK) > 0 or \
+               fours(board.patterns, WHITE) > 0
+
+    def budget(self, board, color):
+        """ Seconds color may spend on its next move, None if unlimited """
+        if not self.limited():
+            return None
+        remaining = self.time_left[color]
+        stones = self.stones_left[color]
+        if remaining <= 0 and stones == 0 and self.byo_yomi_stones > 0:
+            # main time is over: a new byo-yomi period starts
+            remaining = self.byo_yomi_time
+            stones = self.byo_yomi_stones
+        if stones > 0:
+            budget = remaining / stones
+        else:
+            moves_to_go = max(MIN_MOVES_TO_GO,
+                              len(board.get_empty_points()) // 2)
+            budget = remaining / moves_to_go
+            if self.byo_yomi_stones > 0:
+                budget += self.byo_yomi_time / self.byo_yomi_stones
+                remaining += self.byo_yomi_time
+        if self.critical(board):
+            budget *= CRITICAL_FACTOR
+        return max(MIN_BUDGET, min(budget, remaining - SAFETY_MARGIN))
+
+    def spend(self, color, seconds):
+        """
+        Take the seconds of a move of color off its clock, until the
+        controller sends the next time_left
+        """
+        if not self.limited():
+            return
+        left = self.time_left[color] - seconds
+        stones = self.stones_left[color]
+        if stones == 0 and left < 0 and self.byo_yomi_stones > 0:
+            # the move ran into byo-yomi
+            left += self.byo_yomi_time
+            stones = self.byo_yomi_stones
+        if stones > 0:
+            stones -= 1
+            if stones == 0:
+                left = self.byo_yomi_time
+                stones = self.byo_yomi_stones
+        self.time_left[color] = left
+        self.stones_left[color] = stones
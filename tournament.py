@@ -0,0 +1,376 @@
+#!/usr/bin/python3
+"""
+tournament.py
+Play games between two engine configurations and report their strength.
+
+An engine configuration is one of:
+    random        GomokuAssignment2's random player (Gomoku.get_move)
+    genmove       the Minimax-backed genmove of GtpConnection, in-process
+    gtp:COMMAND   any GTP engine started with COMMAND, talked to over pipes
+
+Games run in parallel worker processes. Colors alternate between games,
+every move must be made within the time limit, and a move that is
+illegal or too slow loses the game, as does an engine that answers a
+command with an error or exits. An external engine that has not
+answered genmove by the end of the time limit and its margin, or
+another command within COMMAND_TIMEOUT, is killed. The timelimit command only takes whole
+seconds, so the time limit is rounded down, to at least 1 second, and
+the rounded limit is both sent and enforced.
+The report gives the score of the first engine with a 95% confidence
+interval, the matching Elo difference and the average move latency of
+each engine. Games can be written to an SGF file.
+
+Usage:
+    python3 tournament.py random genmove [--games 20] [--size 7]
+                          [--timelimit 1] [--workers N] [--sgf games.sgf]
+"""
+
+import argparse
+import io
+import math
+import queue
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from board_util import GoBoardUtil, BLACK, WHITE, PASS, coord_to_point
+from game_record import GameRecord, write_sgf
+from gtp_connection import GtpConnection, point_to_coord, format_point, \
+                           move_to_coord
+from simple_board import SimpleGoBoard
+from Gomoku import Gomoku
+
+# moves may take this much longer than the time limit before they lose
+TIME_MARGIN = 0.5
+# seconds an external engine has to exit after quit before it is killed
+QUIT_TIMEOUT = 5
+# seconds an external engine has to answer commands other than genmove
+COMMAND_TIMEOUT = 10
+
+
+def engine_time_limit(time_limit):
+    """ Whole seconds sent with timelimit, and enforced, for time_limit """
+    return max(1, int(math.floor(time_limit)))
+
+
+class GtpPlayer(object):
+    """
+    Base class for players driven by GTP commands.
+    Subclasses define send(command, timeout), which returns the text of
+    the answer, raises GtpError for an error answer and GtpTimeout if
+    there is no answer within timeout seconds.
+    """
+    def new_game(self, size, time_limit):
+        self.send("boardsize {}".format(size))
+        self.send("clear_board")
+        self.send("timelimit {}".format(time_limit))
+
+    def play(self, color, move):
+        self.send("play {} {}".format(color, move))
+
+    def genmove(self, color, timeout = None):
+        return self.send("genmove {}".format(color), timeout)
+
+    def close(self):
+        pass
+
+
+class InProcessPlayer(GtpPlayer):
+    """
+    GtpConnection running in this process, answers read from a buffer
+    """
+    def __init__(self):
+        self.out = io.StringIO()
+        self.con = GtpConnection(Gomoku(), SimpleGoBoard(7),
+                                 outfile = self.out)
+
+    def send(self, command, timeout = None):
+        """ Answer of the connection; it keeps to its own time limit """
+        self.out.seek(0)
+        self.out.truncate()
+        self.con.get_cmd(command)
+        return parse_response(self.out.getvalue())
+
+
+class RandomPlayer(InProcessPlayer):
+    """
+    In-process player choosing its moves with Gomoku.get_move
+    """
+    def genmove(self, color, timeout = None):
+        board = self.con.board
+        move = self.con.go_engine.get_move(board, color)
+        if move == PASS:
+            return "pass"
+        self.play(color, format_point(point_to_coord(move, board.size)))
+        return format_point(point_to_coord(move, board.size))
+
+
+class PipePlayer(GtpPlayer):
+    """
+    External GTP engine talked to over its standard input and output
+    """
+    def __init__(self, command):
+        self.process = subprocess.Popen(shlex.split(command),
+            stdin = subprocess.PIPE, stdout = subprocess.PIPE,
+            universal_newlines = True)
+        # lines of the engine, read by a thread so that send can give up
+        # on an engine that does not answer; None at end of file
+        self.lines = queue.Queue()
+        self.reader = threading.Thread(target = self._read, daemon = True)
+        self.reader.start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            self.lines.put(line)
+        self.lines.put(None)
+
+    def send(self, command, timeout = None):
+        """
+        Answer of the engine to command. An engine that does not answer
+        within timeout seconds, COMMAND_TIMEOUT by default, is killed.
+        """
+        if timeout is None:
+            timeout = COMMAND_TIMEOUT
+        deadline = time.time() + timeout
+        self.process.stdin.write(command + "\n")
+        self.process.stdin.flush()
+        lines = []
+        while True:
+            try:
+                line = self.lines.get(timeout = max(0, deadline - time.time()))
+            except queue.Empty:
+                self.process.kill()
+                raise GtpTimeout("no answer to {} in {:g}s".format(
+                                 command.split()[0], timeout))
+            if line is None:
+                raise EOFError("engine exited")
+            if line.strip() == "" and lines:
+                break
+            if line.strip() != "":
+                lines.append(line)
+        return parse_response(''.join(lines))
+
+    def close(self):
+        if self.process.poll() is None:
+            try:
+                self.send("quit", QUIT_TIMEOUT)
+            except ENGINE_ERRORS:
+                pass
+        try:
+            self.process.wait(timeout = QUIT_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class GtpError(Exception):
+    pass
+
+class GtpTimeout(GtpError):
+    """ An engine did not answer in time and was killed """
+
+# errors of a player that lose it the game: an error answer, or an
+# external engine that exited or closed its pipes
+ENGINE_ERRORS = (GtpError, EOFError, OSError)
+
+
+def parse_response(output):
+    """ Text of a GTP answer; raises GtpError for an error answer """
+    output = output.strip()
+    if output.startswith('?'):
+        raise GtpError(output[1:].strip())
+    return output[1:].strip()
+
+
+def make_player(config):
+    if config == "random":
+        return RandomPlayer()
+    if config == "genmove":
+        return InProcessPlayer()
+    if config.startswith("gtp:"):
+        return PipePlayer(config[4:])
+    raise ValueError("unknown engine configuration: {}".format(config))
+
+
+def play_game(config_a, config_b, a_is_black, size, time_limit):
+    """
+    Play one game. Runs in a worker process.
+    Returns a dict with the winner ("a", "b" or "draw"), the reason,
+    the moves and the move times of each engine.
+    """
+    time_limit = engine_time_limit(time_limit)
+    players = {"a": make_player(config_a), "b": make_player(config_b)}
+    black, white = ("a", "b") if a_is_black else ("b", "a")
+    names = {BLACK: black, WHITE: white}
+    board = SimpleGoBoard(size)
+    moves = []
+    latency = {"a": [], "b": []}
+    result = {"winner": "draw", "reason": "board full"}
+    # the player whose command is running, which loses if it fails
+    current = None
+    try:
+        for current, player in players.items():
+            player.new_game(size, time_limit)
+        color = BLACK
+        passes = 0
+        while len(board.get_empty_points()) > 0:
+            name = names[color]
+            opponent = names[GoBoardUtil.opponent(color)]
+            color_char = "b" if color == BLACK else "w"
+            start = time.time()
+            current = name
+            try:
+                answer = players[name].genmove(color_char,
+                                               time_limit + TIME_MARGIN)
+            except GtpTimeout:
+                answer = None
+            elapsed = time.time() - start
+            latency[name].append(elapsed)
+            if answer is None or elapsed > time_limit + TIME_MARGIN:
+                result = {"winner": opponent, "reason": "time"}
+                break
+            answer = answer.lower()
+            if answer == "resign":
+                result = {"winner": opponent, "reason": "resign"}
+                break
+            if answer == "pass":
+                moves.append((color, PASS))
+                current = opponent
+                players[opponent].play(color_char, "pass")
+                passes += 1
+                if passes == 2:
+                    result = {"winner": "draw", "reason": "passes"}
+                    break
+            else:
+                passes = 0
+                try:
+                    row, col = move_to_coord(answer, size)
+                    point = coord_to_point(row, col, size)
+                except (ValueError, TypeError, AssertionError):
+                    point = None
+                if point is None or not board.play_move_gomoku(point, color):
+                    result = {"winner": opponent,
+                              "reason": "illegal move " + answer}
+                    break
+                moves.append((color, point))
+                current = opponent
+                players[opponent].play(color_char, answer)
+                if board.point_check_game_end_gomoku(point):
+                    result = {"winner": name, "reason": "five"}
+                    break
+            color = GoBoardUtil.opponent(color)
+    except ENGINE_ERRORS as e:
+        result = {"winner": "b" if current == "a" else "a",
+                  "reason": "error: {}: {}".format(type(e).__name__, e)}
+    finally:
+        for player in players.values():
+            try:
+                player.close()
+            except ENGINE_ERRORS:
+                pass
+    result["moves"] = moves
+    result["latency"] = latency
+    result["black"] = black
+    return result
+
+
+def score_interval(score, games, z = 1.96):
+    """
+    Wilson confidence interval of a mean score, draws counting half
+    """
+    if games == 0:
+        return 0.0, 1.0
+    center = (score + z * z / (2 * games)) / (1 + z * z / games)
+    margin = z * math.sqrt(score * (1 - score) / games +
+                           z * z / (4 * games * games)) / (1 + z * z / games)
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def elo(score):
+    """ Elo difference that gives the expected score """
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return 0.0 - 400 * math.log10(1 / score - 1)
+
+
+def report(results, config_a, config_b, out):
+    games = len(results)
+    wins = sum(1 for r in results if r["winner"] == "a")
+    losses = sum(1 for r in results if r["winner"] == "b")
+    draws = games - wins - losses
+    score = (wins + 0.5 * draws) / games if games else 0.0
+    low, high = score_interval(score, games)
+    out.write("{} vs {}: {} games, +{} ={} -{}\n".format(
+              config_a, config_b, games, wins, draws, losses))
+    out.write("score {:.3f} (95% {:.3f} to {:.3f}), elo {:+.0f} "
+              "({:+.0f} to {:+.0f})\n".format(score, low, high, elo(score),
+                                            elo(low), elo(high)))
+    for name, config in (("a", config_a), ("b", config_b)):
+        times = [t for r in results for t in r["latency"][name]]
+        average = sum(times) / len(times) if times else 0.0
+        out.write("{}: {} moves, average latency {:.3f}s, "
+                  "max {:.3f}s\n".format(config, len(times), average,
+                                         max(times) if times else 0.0))
+    reasons = {}
+    for r in results:
+        reasons[r["reason"]] = reasons.get(r["reason"], 0) + 1
+    out.write("results by reason: {}\n".format(", ".join(
+              "{} {}".format(k, v) for k, v in sorted(reasons.items()))))
+
+
+def write_games(path, results, config_a, config_b, size):
+    names = {"a": config_a, "b": config_b}
+    with open(path, "w") as f:
+        for r in results:
+            black = r["black"]
+            white = "b" if black == "a" else "a"
+            if r["winner"] == "draw":
+                outcome = "0"
+            else:
+                outcome = ("B" if r["winner"] == black else "W") + "+"
+            write_sgf(f, GameRecord(size, r["moves"], {
+                "PB": names[black], "PW": names[white], "RE": outcome}))
+
+
+def run_tournament(config_a, config_b, games, size = 7, time_limit = 1,
+                   workers = None):
+    """
+    Play games between two configurations, alternating colors.
+    Returns the list of game results.
+    """
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = [executor.submit(play_game, config_a, config_b,
+                                   i % 2 == 0, size, time_limit)
+                   for i in range(games)]
+        return [f.result() for f in futures]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Play games between two engine configurations")
+    parser.add_argument("engine_a")
+    parser.add_argument("engine_b")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--size", type=int, default=7)
+    parser.add_argument("--timelimit", type=float, default=1,
+                        help="seconds per move")
+    parser.add_argument("--workers", type=int,
+                        help="parallel games, by default one per CPU")
+    parser.add_argument("--sgf", help="write the games to this SGF file")
+    args = parser.parse_args(argv)
+
+    results = run_tournament(args.engine_a, args.engine_b, args.games,
+                             args.size, args.timelimit, args.workers)
+    report(results, args.engine_a, args.engine_b, sys.stdout)
+    if args.sgf:
+        write_games(args.sgf, results, args.engine_a, args.engine_b,
+                    args.size)
+
+
+if __name__ == '__main__':
+    main()